@@ -1,98 +1,45 @@
+import asyncio
+import concurrent.futures
+import fastjsonschema
+import hashlib
+import httpx
 import json
+import math
+import numbers
+import orjson
 import os
-import requests
 import re 
-import time
+import threading
+import uuid
+import weakref
+from functools import wraps
+from redis import Redis
+from typing import Final
 
+# Read at import, but only enforced when a request is actually made, so importing the
+# worker (API server, CLI tools) never fails just because no key is configured.
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY","")
-if not OPENROUTER_API_KEY:
-    raise ValueError("CRITICAL ERROR: OPENROUTER_API_KEY environment variable is not set.")
 
-def _call_openrouter_api(system_prompt: str, user_prompt: str, temperature: float = 0.2) -> dict:
-    """
-    A private helper function to handle the actual API call to OpenRouter.
-    Includes RETRY LOGIC to handle malformed JSON responses from the AI.
-    """
-    MAX_RETRIES = 3
-    
-    for attempt in range(MAX_RETRIES):
-        try:
-            # We use a slight backoff if it's a retry
-            if attempt > 0:
-                time.sleep(1)
-                
-            response = requests.post(
-                url="https://openrouter.ai/api/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                    "Content-Type": "application/json",
-                    "HTTP-Referer": "http://localhost:3000",
-                    "X-Title": "DataCraft Studio"
-                },
-                data=json.dumps({
-                    "model": "nvidia/nemotron-3-nano-30b-a3b:free",
-                    "temperature": temperature,
-                    # asking for json_object can help if the model supports it
-                    "response_format": { "type": "json_object" },
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ]
-                }),
-                timeout=120 
-            )
-            response.raise_for_status()
-            response_data = response.json()
-            
-            if not response_data.get('choices'):
-                raise ValueError("AI Service returned no content choices.")
-
-            ai_content_string = response_data['choices'][0]['message']['content']
-            
-            # --- Cleaning Step 1: Remove Markdown Code Blocks ---
-            # This handles ```json ... ``` or just ``` ... ``` wrapping
-            cleaned_string = re.sub(r'^```[a-z]*\s*', '', ai_content_string, flags=re.MULTILINE)
-            cleaned_string = re.sub(r'\s*```$', '', cleaned_string, flags=re.MULTILINE)
-            cleaned_string = cleaned_string.strip()
-
-            # --- Cleaning Step 2: Find JSON boundaries ---
-            # We look for the first '{' and the last '}'
-            json_match = re.search(r'\{.*\}', cleaned_string, re.DOTALL)
-            
-            if not json_match:
-                # If we can't find braces, the output is definitely not JSON.
-                print(f"DEBUG (Attempt {attempt+1}): No JSON braces found in output: {ai_content_string[:100]}...")
-                continue # Retry
-            
-            json_string = json_match.group(0)
-            
-            # --- Validation Step ---
-            return json.loads(json_string)
-
-        except json.JSONDecodeError as e:
-            print(f"JSON Parse Error in _call_openrouter_api (Attempt {attempt+1}/{MAX_RETRIES}): {e}")
-            # If it's the last attempt, we let the loop finish to return the error
-            if attempt == MAX_RETRIES - 1:
-                print(f"DEBUG: Failed Content was:\n{ai_content_string}")
-        except Exception as e:
-            print(f"Network/API Error in _call_openrouter_api (Attempt {attempt+1}/{MAX_RETRIES}): {e}")
-            if attempt == MAX_RETRIES - 1:
-                return {
-                    "error": "AI Service Connection Failed", 
-                    "details": str(e)
-                }
+def _require_api_key() -> str:
+    global OPENROUTER_API_KEY
+    if not OPENROUTER_API_KEY:
+        # The env may have been populated after import (e.g. load_dotenv in main.py).
+        OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY", "")
+        if not OPENROUTER_API_KEY:
+            raise RuntimeError("CRITICAL ERROR: OPENROUTER_API_KEY environment variable is not set.")
+    return OPENROUTER_API_KEY
 
-    # If we exit the loop, we failed to get valid JSON
-    return {
-        "error": "AI Generation Failed",
-        "details": "The AI model failed to generate valid JSON after multiple attempts. Please try again."
-    }
+MODEL = "nvidia/nemotron-3-nano-30b-a3b:free"
+# Columns with nothing to explain (fully populated, no missingness pattern) are routed
+# to a much smaller model; everything else, including treatment plans, keeps MODEL.
+LIGHT_MODEL = "meta-llama/llama-3.2-3b-instruct:free"
+# Bump this whenever a system prompt changes so stale cached answers are not served.
+PROMPT_VERSION = "1"
 
-def get_ai_interpretation(profile: dict) -> dict:
-    """
-    Sends a detailed statistical profile to an LLM for expert interpretation (existing functionality).
-    """
-    system_prompt = """
+# === SYSTEM PROMPTS ===
+# Built once at import. Sending byte-identical system prompts on every call also lets
+# providers that support prompt-prefix caching reuse them.
+_INTERPRETATION_SYSTEM_PROMPT: Final[str] = """
     You are a principal data scientist with 20+ years experience. Your task is to analyze a statistical profile of a column and provide a professional recommendation that reflects how human experts think — not rigid rule-following.
 
     ## HOW REAL DATA SCIENTISTS THINK (NOT RULE ENGINES)
@@ -143,16 +90,779 @@ def get_ai_interpretation(profile: dict) -> dict:
     "warning": "Critical risk: If gaps occur during equipment failure, ffill would distort readings"
     }
     """
+
+_BATCH_INTERPRETATION_SYSTEM_PROMPT: Final[str] = _INTERPRETATION_SYSTEM_PROMPT + """
+    ## BATCH MODE
+    You will receive SEVERAL column profiles as one JSON object keyed by column name.
+    Keep the <thinking> block brief, then return ONE JSON object with exactly the same keys,
+    where each value follows the response format above:
+    {"<column_name>": {"recommendation": "...", "reasoning_summary": "...", "assumptions": [...], "warning": "..."}, ...}
+    """
+
+_TREATMENT_PLAN_SYSTEM_PROMPT: Final[str] = """
+    **ROLE**: Principal Data Scientist. You generate data cleaning strategies based on evidence, NOT blind checklists.
+
+    ### 1. THE ALLOWED ACTION LIBRARY (STRICT)
+    **Actions**:
+    - **Cleaning**: `delete_column`, `drop_rows_where_null` (target/ID only), `drop_duplicate_rows`.
+    - **Imputation**: `impute_mean`, `impute_median`, `impute_mode`, `impute_constant`, `forward_fill` (time-series only).
+    - **Encoding**: `one_hot_encode`, `label_encode`.
+    - **Transformation**: `log_transform`, `standard_scale`, `min_max_scale`, `clip_outliers`.
+    - **Creation**: `create_interaction`, `create_date_features`, `create_missing_flag`.
+
+    **COLUMN ACTION COMPATIBILITY RULE (VIOLATION = HALLUCINATION)**:
+    - `log_transform`, `clip_outliers`, `standard_scale`, `min_max_scale` → **NUMERIC COLUMNS ONLY**.
+    - `impute_mean`, `impute_median` → **NUMERIC COLUMNS ONLY**.
+    - `one_hot_encode`, `label_encode` → **CATEGORICAL/OBJECT COLUMNS ONLY**.
+    - `impute_mode` → Any column.
+
+    ### 2. STRATEGY ARCHETYPES (PHILOSOPHIES, NOT RULES)
+    
+    **Plan 1: CONSERVATIVE ("The Auditor")**
+    * *Philosophy*: "Do no harm." Prefer deleting bad data over guessing (imputing).
+    * *Example Thought*: "Column 'age' has 5% missing. Imputation might bias results. Better to drop these few rows if dataset is large, or impute strictly with median."
+    
+    **Plan 2: BALANCED ("The Engineer")**
+    * *Philosophy*: "Standard Best Practices." Use Median for skew, Mean for normal. Handle outliers.
+    * *Example Thought*: "'Income' is highly skewed (skew=5.2). Mean imputation is dangerous here; I will use Median."
     
-    user_prompt = f"Here is the statistical profile to analyze:\n{json.dumps(profile, indent=2)}"
+    **Plan 3: AGGRESSIVE ("The Maximizer")**
+    * *Philosophy*: "Keep every row." Never drop rows. Impute everything. Flag missing values as features.
+    * *Example Thought*: "I can't afford to lose any rows. I will impute 'age' and also create a 'age_is_missing' column to capture the signal of missingness."
+    * *Aggressive plans MAY explore new features, BUT they must justify them using:
+    - Target correlation strength.
+    - Explicit domain plausibility.
+    - Variance amplification.
+    * *If none apply, SKIP feature creation.*
+
+    **Plan 4: ARCHITECT ("The Feature Forge")**
+    * *Philosophy*: "Domain Specific." Focus on feature creation (interactions, date parts) over just cleaning.
+    * *Example Thought*: "Since we have 'price' and 'quantity', the most predictive feature is likely 'revenue = price * qty'. I must create this."
+    * *Architect plans MAY explore new features, BUT they must justify them using:
+    - Target correlation strength.
+    - Explicit domain plausibility.
+    - Variance amplification.
+    * *If none apply, SKIP feature creation.*
+
+    ### 3. FINAL SELF-CHECK (MANDATORY)
+    Before returning JSON, verify:
+    - All `target_columns` are in the dataset, no hallucinated columns.
+    - No numeric actions (log/scale) applied to categorical columns.
+    - Every step cites a specific statistic (e.g. "Using IQR to clip and limit the effect of extreme values beyond –14.5 and 46.5" "Imputing missing ages with a median of 32 to avoid distortion from a few very large values.").
+
+    ### 4. OUTPUT FORMAT (STRICT JSON)
+    You MUST return this exact JSON structure. `steps` matches `python_code`.
     
-    return _call_openrouter_api(system_prompt, user_prompt)
+    {
+      "conservative_plan": {
+        "name": "Conservative Strategy",
+        "rationale": "High missingness in 'marketing_channel' (40%) warrants deletion to avoid noise.",
+        "steps": [
+            { 
+                "function_name": "delete_column", 
+                "target_columns": ["marketing_channel"], 
+                "reasoning": "Missing > 40% (Actual: 42%)" 
+            },
+            {
+                "function_name": "impute_median",
+                "target_columns": ["age"],
+                "reasoning": "Low missingness (5%), skew is high (2.1)"
+            }
+        ],
+        "python_code": "import pandas as pd\\nimport numpy as np\\n# Code that implements the steps above..."
+      },
+      "balanced_plan": { ... },
+      "aggressive_plan": { ... },
+      "architect_plan": { ... }
+    }
+
+    """
+
+# === RESPONSE CACHE ===
+# Identical prompts are answered from Redis (shared across workers) with a small
+# in-process layer in front of it for hot keys.
+AI_CACHE_TTL_SECONDS = 86400
+_HOT_CACHE_MAX_ENTRIES = 256
+_hot_cache: dict = {}
+
+redis_cache = Redis(
+    host=os.getenv("REDIS_HOST", "localhost"),
+    port=int(os.getenv("REDIS_PORT", 6379)),
+    db=int(os.getenv("REDIS_DB_CACHE", 1)),
+    decode_responses=True
+)
+
+def _response_cache_key(system_prompt: str, user_prompt: str, temperature: float, model: str = MODEL) -> str:
+    payload = json.dumps({
+        "sys": system_prompt,
+        "usr": user_prompt,
+        "model": model,
+        "temperature": temperature,
+        "version": PROMPT_VERSION
+    }, sort_keys=True)
+    return f"ai_cache:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+def _cache_get(key: str):
+    # Serialised JSON is cached (not dicts) so callers can never mutate a shared entry.
+    raw = _hot_cache.get(key)
+    if raw is None:
+        try:
+            raw = redis_cache.get(key)
+        except Exception as e:
+            print(f"AI cache read failed for {key}: {e}")
+            return None
+        if raw is None:
+            return None
+        _remember(key, raw)
+    return orjson.loads(raw)
+
+def _cache_set(key: str, result: dict) -> None:
+    raw = orjson.dumps(result)
+    _remember(key, raw)
+    try:
+        redis_cache.set(key, raw, ex=AI_CACHE_TTL_SECONDS)
+    except Exception as e:
+        print(f"AI cache write failed for {key}: {e}")
+
+# Coroutines on the shared loop must not block it on a Redis round-trip; every stream
+# in flight would stall behind it. Hot-cache hits are answered inline, the rest goes
+# through the loop's default executor.
+async def _cache_get_async(key: str):
+    raw = _hot_cache.get(key)
+    if raw is not None:
+        return orjson.loads(raw)
+    return await asyncio.get_running_loop().run_in_executor(None, _cache_get, key)
+
+async def _cache_set_async(key: str, result: dict) -> None:
+    await asyncio.get_running_loop().run_in_executor(None, _cache_set, key, result)
+
+def _remember(key: str, raw) -> None:
+    if key not in _hot_cache and len(_hot_cache) >= _HOT_CACHE_MAX_ENTRIES:
+        _hot_cache.pop(next(iter(_hot_cache)))
+    _hot_cache[key] = raw
+
+def _cached_response(func):
+    """
+    Short-circuits repeat calls with the exact same prompts. Only successful
+    parses are stored, so a transient failure never poisons the cache.
+    """
+    if asyncio.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(system_prompt: str, user_prompt: str, temperature: float = 0.2,
+                                bypass_cache: bool = False, **kwargs) -> dict:
+            key = _response_cache_key(system_prompt, user_prompt, temperature, kwargs.get("model", MODEL))
+            if not bypass_cache:
+                cached = await _cache_get_async(key)
+                if cached is not None:
+                    return cached
+
+            result = await func(system_prompt, user_prompt, temperature, **kwargs)
+            if "error" not in result:
+                await _cache_set_async(key, result)
+            return result
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(system_prompt: str, user_prompt: str, temperature: float = 0.2,
+                bypass_cache: bool = False, **kwargs) -> dict:
+        key = _response_cache_key(system_prompt, user_prompt, temperature, kwargs.get("model", MODEL))
+        if not bypass_cache:
+            cached = _cache_get(key)
+            if cached is not None:
+                return cached
+
+        result = func(system_prompt, user_prompt, temperature, **kwargs)
+        if "error" not in result:
+            _cache_set(key, result)
+        return result
+    return wrapper
+
+# === NEAR-DUPLICATE CACHE ===
+# Re-uploading the same dataset with a handful of extra rows nudges every statistic
+# slightly, which defeats the exact-match cache. Numbers are rounded to a few
+# significant digits before hashing so statistically equivalent profiles share a key.
+# Plans are more sensitive to the input than column interpretations, so they keep
+# more precision.
+INTERPRETATION_SIGNIFICANT_DIGITS = 2
+TREATMENT_PLAN_SIGNIFICANT_DIGITS = 3
+_FINGERPRINT_IGNORED_KEYS = {"filename"}
+
+def _quantize(value, digits: int):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, numbers.Real):
+        value = float(value)
+        if value == 0 or not math.isfinite(value):
+            return value
+        return float(f"{value:.{digits}g}")
+    if isinstance(value, dict):
+        return {k: _quantize(v, digits) for k, v in value.items() if k not in _FINGERPRINT_IGNORED_KEYS}
+    if isinstance(value, (list, tuple)):
+        return [_quantize(v, digits) for v in value]
+    return value
+
+def _near_duplicate_key(kind: str, payload: dict, digits: int, model: str = MODEL) -> str:
+    fingerprint = json.dumps({
+        "kind": kind,
+        "payload": _quantize(payload, digits),
+        "model": model,
+        "version": PROMPT_VERSION
+    }, sort_keys=True, default=str)
+    return f"ai_cache:near:{hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()}"
+
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+# Profiles come straight out of pandas, so numpy scalars must serialise natively.
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def _dumps_for_prompt(data: dict) -> str:
+    # Compact on purpose: indentation is billed as input tokens and the model does
+    # not need it to read the structure.
+    return orjson.dumps(data, option=_ORJSON_OPTIONS).decode('utf-8')
+
+# === OUTPUT TOKEN BUDGETS ===
+# Without a cap the model can ramble through thousands of <thinking> tokens before the
+# JSON, which is where most of the latency and spend goes. Budgets leave room for a
+# short reasoning block plus the response schema of each caller.
+DEFAULT_MAX_OUTPUT_TOKENS = 1500
+INTERPRETATION_MAX_OUTPUT_TOKENS = 1024
+TREATMENT_PLAN_MAX_OUTPUT_TOKENS = 4096
+
+def _build_request(system_prompt: str, user_prompt: str, temperature: float, max_output_tokens: int,
+                   stream: bool = False, model: str = MODEL) -> tuple:
+    headers = {
+        "Authorization": f"Bearer {_require_api_key()}",
+        "Content-Type": "application/json",
+        "HTTP-Referer": "http://localhost:3000",
+        "X-Title": "DataCraft Studio"
+    }
+    payload = {
+        "model": model,
+        "temperature": temperature,
+        "max_tokens": max_output_tokens,
+        "stream": stream,
+        # asking for json_object can help if the model supports it
+        "response_format": { "type": "json_object" },
+        "messages": [
+            # cache_control marks the static system prompt as a cacheable prefix for
+            # providers that support it; others ignore the hint.
+            {"role": "system", "content": [
+                {"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}
+            ]},
+            {"role": "user", "content": user_prompt}
+        ]
+    }
+    return headers, payload
+
+def _with_idempotency_key(headers: dict) -> dict:
+    """
+    One key per attempt: connection-level resends of the same attempt (the transport's
+    connect retries re-send the same request) carry the same key and can be
+    deduplicated upstream, while an app-level retry after malformed output asks for a
+    genuinely new generation.
+    """
+    return {**headers, "Idempotency-Key": uuid.uuid4().hex}
+
+# === RESPONSE SCHEMAS ===
+# Parseable-but-wrong JSON (missing plans, a bare thinking-block object) used to slip
+# through and break consumers later. Validators are compiled once at import.
+_INTERPRETATION_SCHEMA = {
+    "type": "object",
+    "required": ["recommendation", "reasoning_summary", "assumptions", "warning"],
+    "properties": {
+        "recommendation": {"type": "string"},
+        "reasoning_summary": {"type": "string"},
+        "assumptions": {"type": "array"},
+        "warning": {"type": "string"}
+    }
+}
+_PLAN_SCHEMA = {
+    "type": "object",
+    "required": ["name", "rationale", "steps", "python_code"],
+    "properties": {
+        "name": {"type": "string"},
+        "rationale": {"type": "string"},
+        "steps": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["function_name", "target_columns"],
+                "properties": {
+                    "function_name": {"type": "string"},
+                    "target_columns": {"type": "array"}
+                }
+            }
+        },
+        "python_code": {"type": "string"}
+    }
+}
+_PLAN_KEYS = ["conservative_plan", "balanced_plan", "aggressive_plan", "architect_plan"]
+
+_validate_interpretation = fastjsonschema.compile(_INTERPRETATION_SCHEMA)
+_validate_interpretation_batch = fastjsonschema.compile({
+    "type": "object",
+    "minProperties": 1,
+    "additionalProperties": _INTERPRETATION_SCHEMA
+})
+_validate_treatment_plans = fastjsonschema.compile({
+    "type": "object",
+    "required": _PLAN_KEYS,
+    "properties": {key: _PLAN_SCHEMA for key in _PLAN_KEYS}
+})
+
+def _interpretation_batch_validator(columns):
+    """
+    _validate_interpretation_batch plus a key for every column of the chunk, so a stray
+    object in the reasoning text (even {}) never passes for the answer.
+    """
+    required = [str(column) for column in columns]
+    def validate(data):
+        _validate_interpretation_batch(data)
+        missing = [column for column in required if column not in data]
+        if missing:
+            raise fastjsonschema.JsonSchemaException(f"data must contain {missing} properties")
+        return data
+    return validate
+
+def _matches_schema(validator, data) -> bool:
+    if validator is None:
+        return True
+    try:
+        validator(data)
+        return True
+    except fastjsonschema.JsonSchemaException:
+        return False
+
+_CODE_FENCE_OPEN_RE = re.compile(r'^```[a-z]*\s*', re.MULTILINE)
+_CODE_FENCE_CLOSE_RE = re.compile(r'\s*```$', re.MULTILINE)
+
+class _JsonObjectScanner:
+    """
+    Incremental brace-balance scanner. Text can be fed in pieces as it streams in;
+    feed() returns each balanced top-level {...} as soon as its closing brace arrives.
+    Braces inside JSON strings are ignored.
+    """
+    def __init__(self):
+        self.text = ""
+        self._position = 0
+        self._begin = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str = ""):
+        self.text += chunk
+        text = self.text
+        for i in range(self._position, len(text)):
+            char = text[i]
+            if self._begin is None:
+                if char == '{':
+                    self._begin = i
+                    self._depth = 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    candidate = text[self._begin:i + 1]
+                    self._begin = None
+                    self._position = i + 1
+                    return candidate
+        self._position = len(text)
+        return None
+
+def _iter_json_candidates(text: str):
+    """
+    Yields every outermost balanced {...} in `text`, in order, from a single pass.
+    Top-level objects are yielded as soon as they close. Objects nested inside a
+    stray '{' that never closes are held per depth and yielded at the end, so an
+    unbalanced brace in the reasoning text cannot hide the JSON that follows it.
+    """
+    open_positions = []
+    closed = [[]]
+    in_string = False
+    escape = False
+    for i, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif not open_positions:
+            if char == '{':
+                open_positions.append(i)
+                closed.append([])
+        elif char == '"':
+            in_string = True
+        elif char == '{':
+            open_positions.append(i)
+            closed.append([])
+        elif char == '}':
+            begin = open_positions.pop()
+            closed.pop()
+            if open_positions:
+                closed[-1].append((begin, i + 1))
+            else:
+                yield text[begin:i + 1]
+    for spans in closed[1:]:
+        for begin, end in spans:
+            yield text[begin:end]
+
+def _parse_ai_content(ai_content_string: str, validator=None):
+    """
+    Strips markdown wrapping and parses the JSON object out of the model output.
+    Returns None when the output contains no JSON object at all.
+    With a validator, the first candidate matching the schema wins; if none does,
+    the first parseable one is returned so the caller can report the mismatch.
+    """
+    # --- Cleaning Step 1: Remove Markdown Code Blocks ---
+    # This handles ```json ... ``` or just ``` ... ``` wrapping
+    cleaned_string = _CODE_FENCE_OPEN_RE.sub('', ai_content_string)
+    cleaned_string = _CODE_FENCE_CLOSE_RE.sub('', cleaned_string)
+    cleaned_string = cleaned_string.strip()
+
+    # --- Cleaning Step 2: Find JSON boundaries ---
+    # The <thinking> block may contain stray braces, so a candidate that does not
+    # parse is skipped and the scan moves on to the next one.
+    last_error = None
+    first_parsed = None
+    for json_string in _iter_json_candidates(cleaned_string):
+        # --- Validation Step ---
+        try:
+            parsed = orjson.loads(json_string)
+        except json.JSONDecodeError as e:
+            last_error = e
+            continue
+        if _matches_schema(validator, parsed):
+            return parsed
+        if first_parsed is None:
+            first_parsed = parsed
+
+    if first_parsed is not None:
+        return first_parsed
+    if last_error is not None:
+        raise last_error
+    return None
+
+# === SHARED EVENT LOOP ===
+# All OpenRouter I/O runs on one background event loop per process. Sync callers
+# (Celery tasks) hand their request to it and wait on the future, so every thread in
+# the process multiplexes its LLM calls over the same pooled HTTP/2 connection
+# instead of each holding a socket of its own. Started lazily and re-created after a
+# fork, since a prefork child inherits the loop object but not the thread running it.
+_LOOP = None
+_LOOP_PID = None
+_LOOP_LOCK = threading.Lock()
+
+# Worst case for one call: every attempt hits the read timeout, plus the backoff sleeps.
+_SYNC_CALL_TIMEOUT_SECONDS = 3 * (120 + 1) + 30
+
+def _get_shared_loop() -> asyncio.AbstractEventLoop:
+    global _LOOP, _LOOP_PID
+    with _LOOP_LOCK:
+        if _LOOP is None or _LOOP_PID != os.getpid():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="openrouter-io", daemon=True).start()
+            _LOOP, _LOOP_PID = loop, os.getpid()
+        return _LOOP
+
+def _run_on_shared_loop(coro, timeout: float = _SYNC_CALL_TIMEOUT_SECONDS):
+    """
+    Runs a coroutine on the shared loop and blocks the calling thread for its result.
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, _get_shared_loop())
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise
+
+# === ASYNC CLIENT ===
+# httpx clients are bound to the event loop they first run on, so one pooled
+# HTTP/2 client is kept per loop. Many concurrent calls then multiplex over a few
+# sockets instead of paying a TCP + TLS handshake each. Failed connects are retried
+# by the transport; the loop in _call_openrouter_api_async handles everything else.
+_async_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+def _get_async_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(120.0),
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            transport=httpx.AsyncHTTPTransport(http2=True, retries=2)
+        )
+        _async_clients[loop] = client
+    return client
+
+def _parse_stream_line(line: str, scanner: "_JsonObjectScanner", validator=None):
+    """
+    Feeds one SSE line into the scanner. Returns (finished, parsed dict or None);
+    finished is True on the [DONE] frame or once a JSON object has closed.
+    """
+    # Blank keep-alives and ": OPENROUTER PROCESSING" comments carry no data.
+    if not line or not line.startswith("data: "):
+        return False, None
+    data = line[len("data: "):]
+    if data == "[DONE]":
+        return True, None
+
+    frame = orjson.loads(data)
+    if "error" in frame:
+        raise ValueError(f"AI Service stream error: {frame['error']}")
+    try:
+        delta = frame['choices'][0]['delta'].get('content') or ""
+    except (KeyError, IndexError, AttributeError):
+        return False, None
+
+    candidate = scanner.feed(delta)
+    while candidate is not None:
+        try:
+            parsed = orjson.loads(candidate)
+        except json.JSONDecodeError:
+            # Braces from the <thinking> block; keep scanning.
+            candidate = scanner.feed()
+            continue
+        if isinstance(parsed, dict) and _matches_schema(validator, parsed):
+            return True, parsed
+        candidate = scanner.feed()
+    return False, None
+
+async def _read_streamed_json(response: httpx.Response, validator=None) -> tuple:
+    """
+    Consumes an OpenRouter SSE stream until the first JSON object in the model
+    output closes, then stops reading so the rest of the generation is never
+    waited on. Returns (text received so far, parsed dict or None).
+    Over HTTP/2, leaving early only resets this stream; the connection stays pooled.
+    """
+    scanner = _JsonObjectScanner()
+    async for line in response.aiter_lines():
+        finished, parsed = _parse_stream_line(line, scanner, validator)
+        if finished:
+            return scanner.text, parsed
+    return scanner.text, None
+
+@_cached_response
+async def _call_openrouter_api_async(system_prompt: str, user_prompt: str, temperature: float = 0.2,
+                                     max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS, validator=None,
+                                     model: str = MODEL) -> dict:
+    """
+    A private helper function to handle the actual API call to OpenRouter.
+    Includes RETRY LOGIC to handle malformed JSON responses from the AI.
+    The response is streamed and closed as soon as the JSON object is complete.
+    """
+    MAX_RETRIES = 3
+    headers, payload = _build_request(system_prompt, user_prompt, temperature, max_output_tokens, stream=True, model=model)
+    body = orjson.dumps(payload)
+    client = _get_async_client()
+
+    for attempt in range(MAX_RETRIES):
+        try:
+            # We use a slight backoff if it's a retry
+            if attempt > 0:
+                await asyncio.sleep(1)
+
+            ai_content_string = ""
+            async with client.stream("POST", OPENROUTER_URL, headers=_with_idempotency_key(headers), content=body) as response:
+                response.raise_for_status()
+                ai_content_string, parsed = await _read_streamed_json(response, validator)
+
+            if parsed is None:
+                parsed = _parse_ai_content(ai_content_string, validator)
+
+            if parsed is None:
+                # If we can't find braces, the output is definitely not JSON.
+                print(f"DEBUG (Attempt {attempt+1}): No JSON braces found in output: {ai_content_string[:100]}...")
+                continue # Retry
+
+            if validator is not None:
+                validator(parsed)
+            return parsed
+
+        except json.JSONDecodeError as e:
+            print(f"JSON Parse Error in _call_openrouter_api (Attempt {attempt+1}/{MAX_RETRIES}): {e}")
+            # If it's the last attempt, we let the loop finish to return the error
+            if attempt == MAX_RETRIES - 1:
+                print(f"DEBUG: Failed Content was:\n{ai_content_string}")
+        except fastjsonschema.JsonSchemaException as e:
+            # Valid JSON, wrong shape: treat it like malformed output and retry.
+            print(f"Schema Validation Error in _call_openrouter_api (Attempt {attempt+1}/{MAX_RETRIES}): {e.message}")
+        except Exception as e:
+            print(f"Network/API Error in _call_openrouter_api (Attempt {attempt+1}/{MAX_RETRIES}): {e}")
+            if attempt == MAX_RETRIES - 1:
+                return {
+                    "error": "AI Service Connection Failed",
+                    "details": str(e)
+                }
+
+    # If we exit the loop, we failed to get valid JSON
+    return {
+        "error": "AI Generation Failed",
+        "details": "The AI model failed to generate valid JSON after multiple attempts. Please try again."
+    }
+
+def _call_openrouter_api(system_prompt: str, user_prompt: str, temperature: float = 0.2,
+                         bypass_cache: bool = False, **kwargs) -> dict:
+    """
+    Blocking facade over _call_openrouter_api_async for sync callers.
+    The HTTP I/O itself runs on the shared event loop.
+    """
+    coro = _call_openrouter_api_async(system_prompt, user_prompt, temperature, bypass_cache=bypass_cache, **kwargs)
+    try:
+        return _run_on_shared_loop(coro)
+    except concurrent.futures.TimeoutError:
+        return {
+            "error": "AI Service Connection Failed",
+            "details": f"No response within {_SYNC_CALL_TIMEOUT_SECONDS} seconds."
+        }
+
+def _choose_model(profile: dict) -> str:
+    """
+    Picks the cheapest model that can handle the profile.
+    """
+    if profile.get("missing_count", 0) == 0 and not profile.get("mnar_indicators"):
+        return LIGHT_MODEL
+    return MODEL
+
+def _build_interpretation_user_prompt(profile: dict) -> str:
+    return f"Here is the statistical profile to analyze:\n{_dumps_for_prompt(profile)}"
+
+def get_ai_interpretation(profile: dict, bypass_cache: bool = False) -> dict:
+    """
+    Sends a detailed statistical profile to an LLM for expert interpretation (existing functionality).
+    """
+    model = _choose_model(profile)
+    near_key = _near_duplicate_key("interpretation", profile, INTERPRETATION_SIGNIFICANT_DIGITS, model)
+    if not bypass_cache:
+        cached = _cache_get(near_key)
+        if cached is not None:
+            return cached
+
+    user_prompt = _build_interpretation_user_prompt(profile)
+    result = _call_openrouter_api(_INTERPRETATION_SYSTEM_PROMPT, user_prompt, bypass_cache=bypass_cache,
+                                  max_output_tokens=INTERPRETATION_MAX_OUTPUT_TOKENS, validator=_validate_interpretation,
+                                  model=model)
+    if "error" not in result:
+        _cache_set(near_key, result)
+    return result
+
+# === MULTI-COLUMN INTERPRETATION ===
+# Packing several profiles into one prompt turns N round-trips into ceil(N / chunk).
+# Chunks are bounded by column count and by the estimated prompt size.
+INTERPRETATION_BATCH_MAX_COLUMNS = 20
+INTERPRETATION_BATCH_MAX_INPUT_TOKENS = 12000
+INTERPRETATION_BATCH_TOKENS_PER_COLUMN = 300
+
+def _chunk_profiles(profiles: dict) -> list:
+    """
+    Splits {column: profile} into chunks of {column: serialised profile}. Each profile is
+    serialised exactly once; the same text is used for the size estimate and the prompt.
+    """
+    chunks, current, current_tokens = [], {}, 0
+    for column, profile in profiles.items():
+        serialized = _dumps_for_prompt(profile)
+        tokens = _estimate_tokens(serialized)
+        if current and (len(current) >= INTERPRETATION_BATCH_MAX_COLUMNS
+                        or current_tokens + tokens > INTERPRETATION_BATCH_MAX_INPUT_TOKENS):
+            chunks.append(current)
+            current, current_tokens = {}, 0
+        current[column] = serialized
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+async def _interpret_chunk(chunk: dict, bypass_cache: bool, model: str = MODEL) -> dict:
+    body = ",".join(f"{orjson.dumps(str(column)).decode('utf-8')}:{serialized}" for column, serialized in chunk.items())
+    user_prompt = f"Analyze the following column profiles:\n{{{body}}}"
+    max_output_tokens = INTERPRETATION_MAX_OUTPUT_TOKENS + INTERPRETATION_BATCH_TOKENS_PER_COLUMN * len(chunk)
+    response = await _call_openrouter_api_async(_BATCH_INTERPRETATION_SYSTEM_PROMPT, user_prompt, bypass_cache=bypass_cache,
+                                                max_output_tokens=max_output_tokens, validator=_interpretation_batch_validator(chunk),
+                                                model=model)
+    if "error" in response:
+        return {column: response for column in chunk}
+
+    results = {}
+    for column in chunk:
+        interpretation = response.get(str(column))
+        if isinstance(interpretation, dict):
+            results[column] = interpretation
+        else:
+            results[column] = {
+                "error": "AI Generation Failed",
+                "details": f"The AI model returned no interpretation for column '{column}'."
+            }
+    return results
+
+async def get_ai_interpretations_batch(profiles: dict, bypass_cache: bool = False) -> dict:
+    """
+    Interprets many columns with as few LLM calls as possible: {column: profile} in,
+    {column: interpretation} out. Columns already answered by the cache are not resent.
+    """
+    # Pending columns are grouped by model so simple ones never ride along in a
+    # heavy-model chunk (and vice versa).
+    results, pending, near_keys, models = {}, {}, {}, {}
+    for column, profile in profiles.items():
+        models[column] = _choose_model(profile)
+        near_keys[column] = _near_duplicate_key("interpretation", profile, INTERPRETATION_SIGNIFICANT_DIGITS, models[column])
+    cached_entries = ([None] * len(profiles) if bypass_cache
+                      else await asyncio.gather(*[_cache_get_async(near_keys[column]) for column in profiles]))
+    for (column, profile), cached in zip(profiles.items(), cached_entries):
+        if cached is not None:
+            results[column] = cached
+        else:
+            pending.setdefault(models[column], {})[column] = profile
+
+    chunk_results = await asyncio.gather(*[
+        _interpret_chunk(chunk, bypass_cache, model)
+        for model, group in pending.items()
+        for chunk in _chunk_profiles(group)
+    ])
+    writes = []
+    for chunk_result in chunk_results:
+        for column, interpretation in chunk_result.items():
+            if "error" not in interpretation:
+                writes.append(_cache_set_async(near_keys[column], interpretation))
+            results[column] = interpretation
+    await asyncio.gather(*writes)
+
+    return {column: results[column] for column in profiles}
+
+def get_ai_interpretations(profiles: dict, bypass_cache: bool = False) -> dict:
+    """
+    Blocking facade over get_ai_interpretations_batch for sync callers (Celery tasks).
+    On timeout every column gets the connection-failure payload.
+    """
+    try:
+        return _run_on_shared_loop(get_ai_interpretations_batch(profiles, bypass_cache=bypass_cache))
+    except concurrent.futures.TimeoutError:
+        error = {
+            "error": "AI Service Connection Failed",
+            "details": f"No response within {_SYNC_CALL_TIMEOUT_SECONDS} seconds."
+        }
+        return {column: error for column in profiles}
 
 # === HELPER: TOKEN-SAFE REPORT CONDENSATION ===
-def _condense_diagnostic_report(report: dict, top_n: int = 25) -> dict:
+def _condense_diagnostic_report(report: dict, top_n: int = 25, detail_fields: set = None) -> dict:
     """
     Reduces token count by ~90% while preserving critical diagnostic signals.
     Keeps full details only for problematic columns.
+    With `detail_fields`, the overviews are also restricted to the critical columns
+    and each column detail keeps only the whitelisted metrics (compact mode).
     """
     # 1. Base Structure
     condensed = {
@@ -184,9 +894,52 @@ def _condense_diagnostic_report(report: dict, top_n: int = 25) -> dict:
             col: details for col, details in report['column_details'].items()
             if col in critical_cols
         }
+
+    # 4. Compact Mode (prompt over the input budget)
+    if detail_fields is not None:
+        for section in ("missingness_overview", "skew_overview", "target_correlations"):
+            condensed[section] = {col: val for col, val in condensed[section].items() if col in critical_cols}
+        if 'column_details' in condensed:
+            condensed['column_details'] = {
+                col: {k: v for k, v in details.items() if k in detail_fields}
+                for col, details in condensed['column_details'].items()
+            }
     
     return condensed
 
+# === HELPER: PRE-FLIGHT INPUT TOKEN BUDGET ===
+# A rough chars-per-token estimate is enough to tell "fits" from "way too big";
+# the free models behind OpenRouter do not share one tokenizer anyway.
+TREATMENT_PLAN_MAX_INPUT_TOKENS = 16000
+_CHARS_PER_TOKEN = 4
+# Only the metrics the plan prompt actually reasons about survive compact mode.
+_PLAN_DETAIL_FIELDS = {
+    "data_type", "missing_count", "missing_percentage", "unique_count",
+    "unique_ratio", "constant_flag", "skewness", "kurtosis"
+}
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // _CHARS_PER_TOKEN + 1
+
+def _build_treatment_plan_user_prompt(condensed_report: dict, target_var: str, problem_type: str, temporal_col: str) -> str:
+    top_missing = sorted(condensed_report['missingness_overview'].items(), key=lambda x: x[1], reverse=True)[:5]
+    
+    return f"""
+    ### DATASET CONTEXT
+    - **Target Variable**: "{target_var}" ({problem_type})
+    - **Temporal Column**: {temporal_col if temporal_col else 'None'}
+    - **Problem**: Missing values and potential outliers need handling.
+    
+    ### DIAGNOSTIC SUMMARY
+    - **Top Missing Columns**: {top_missing}
+    - **Skewed Columns**: {[k for k, v in condensed_report['skew_overview'].items() if abs(v) > 2.0]}
+    
+    ### FULL REPORT
+    {_dumps_for_prompt(condensed_report)}
+    
+    Generate the FOUR plans. Ensure `steps` array is populated and `python_code` is valid pandas.
+    """
+
 # === HELPER: SAFETY-HARDENED FALLBACK PLAN ===
 def _generate_fallback_plan(report: dict, target: str, temporal_col: str = None) -> dict:
     """
@@ -232,11 +985,17 @@ def _generate_fallback_plan(report: dict, target: str, temporal_col: str = None)
         "architect_plan": {"name": "Architect Plan (Unavailable)", "rationale": "Service unavailable", "steps": [], "python_code": ""}
     }
 
-def get_treatment_plan_hypotheses(diagnostic_report: dict) -> dict:
+def get_treatment_plan_hypotheses(diagnostic_report: dict, bypass_cache: bool = False) -> dict:
     """
     Generates FOUR statistically rigorous data preparation strategies.
     Strictly constrained to the Action Library to prevent hallucination.
     """
+    near_key = _near_duplicate_key("treatment_plans", diagnostic_report, TREATMENT_PLAN_SIGNIFICANT_DIGITS)
+    if not bypass_cache:
+        cached = _cache_get(near_key)
+        if cached is not None:
+            return cached
+
     # === 1. CONTEXT EXTRACTION & SAFETY DEFAULTS ===
     context = diagnostic_report.get('modeling_context', {})
     target_var = context.get('target_variable', 'target')
@@ -244,110 +1003,26 @@ def get_treatment_plan_hypotheses(diagnostic_report: dict) -> dict:
     temporal_col = context.get('temporal_column', None)
     
     # === 2. TOKEN-SAFE REPORT CONDENSATION ===
-    condensed_report = _condense_diagnostic_report(diagnostic_report, top_n=25)
-
-    # === 3. SYSTEM PROMPT (STRICT ACTION LIBRARY & EXAMPLES) ===
-    system_prompt = f"""
-    **ROLE**: Principal Data Scientist. You generate data cleaning strategies based on evidence, NOT blind checklists.
-
-    ### 1. THE ALLOWED ACTION LIBRARY (STRICT)
-    **Actions**:
-    - **Cleaning**: `delete_column`, `drop_rows_where_null` (target/ID only), `drop_duplicate_rows`.
-    - **Imputation**: `impute_mean`, `impute_median`, `impute_mode`, `impute_constant`, `forward_fill` (time-series only).
-    - **Encoding**: `one_hot_encode`, `label_encode`.
-    - **Transformation**: `log_transform`, `standard_scale`, `min_max_scale`, `clip_outliers`.
-    - **Creation**: `create_interaction`, `create_date_features`, `create_missing_flag`.
-
-    **COLUMN ACTION COMPATIBILITY RULE (VIOLATION = HALLUCINATION)**:
-    - `log_transform`, `clip_outliers`, `standard_scale`, `min_max_scale` → **NUMERIC COLUMNS ONLY**.
-    - `impute_mean`, `impute_median` → **NUMERIC COLUMNS ONLY**.
-    - `one_hot_encode`, `label_encode` → **CATEGORICAL/OBJECT COLUMNS ONLY**.
-    - `impute_mode` → Any column.
-
-    ### 2. STRATEGY ARCHETYPES (PHILOSOPHIES, NOT RULES)
-    
-    **Plan 1: CONSERVATIVE ("The Auditor")**
-    * *Philosophy*: "Do no harm." Prefer deleting bad data over guessing (imputing).
-    * *Example Thought*: "Column 'age' has 5% missing. Imputation might bias results. Better to drop these few rows if dataset is large, or impute strictly with median."
-    
-    **Plan 2: BALANCED ("The Engineer")**
-    * *Philosophy*: "Standard Best Practices." Use Median for skew, Mean for normal. Handle outliers.
-    * *Example Thought*: "'Income' is highly skewed (skew=5.2). Mean imputation is dangerous here; I will use Median."
-    
-    **Plan 3: AGGRESSIVE ("The Maximizer")**
-    * *Philosophy*: "Keep every row." Never drop rows. Impute everything. Flag missing values as features.
-    * *Example Thought*: "I can't afford to lose any rows. I will impute 'age' and also create a 'age_is_missing' column to capture the signal of missingness."
-    * *Aggressive plans MAY explore new features, BUT they must justify them using:
-    - Target correlation strength.
-    - Explicit domain plausibility.
-    - Variance amplification.
-    * *If none apply, SKIP feature creation.*
-
-    **Plan 4: ARCHITECT ("The Feature Forge")**
-    * *Philosophy*: "Domain Specific." Focus on feature creation (interactions, date parts) over just cleaning.
-    * *Example Thought*: "Since we have 'price' and 'quantity', the most predictive feature is likely 'revenue = price * qty'. I must create this."
-    * *Architect plans MAY explore new features, BUT they must justify them using:
-    - Target correlation strength.
-    - Explicit domain plausibility.
-    - Variance amplification.
-    * *If none apply, SKIP feature creation.*
-
-    ### 3. FINAL SELF-CHECK (MANDATORY)
-    Before returning JSON, verify:
-    - All `target_columns` are in the dataset, no hallucinated columns.
-    - No numeric actions (log/scale) applied to categorical columns.
-    - Every step cites a specific statistic (e.g. "Using IQR to clip and limit the effect of extreme values beyond –14.5 and 46.5" "Imputing missing ages with a median of 32 to avoid distortion from a few very large values.").
+    top_n = 25
+    condensed_report = _condense_diagnostic_report(diagnostic_report, top_n=top_n)
 
-    ### 4. OUTPUT FORMAT (STRICT JSON)
-    You MUST return this exact JSON structure. `steps` matches `python_code`.
-    
-    {{
-      "conservative_plan": {{
-        "name": "Conservative Strategy",
-        "rationale": "High missingness in 'marketing_channel' (40%) warrants deletion to avoid noise.",
-        "steps": [
-            {{ 
-                "function_name": "delete_column", 
-                "target_columns": ["marketing_channel"], 
-                "reasoning": "Missing > 40% (Actual: 42%)" 
-            }},
-            {{
-                "function_name": "impute_median",
-                "target_columns": ["age"],
-                "reasoning": "Low missingness (5%), skew is high (2.1)"
-            }}
-        ],
-        "python_code": "import pandas as pd\\nimport numpy as np\\n# Code that implements the steps above..."
-      }},
-      "balanced_plan": {{ ... }},
-      "aggressive_plan": {{ ... }},
-      "architect_plan": {{ ... }}
-    }}
-
-    """
-
-    # === 4. USER PROMPT ===
-    top_missing = sorted(condensed_report['missingness_overview'].items(), key=lambda x: x[1], reverse=True)[:5]
-    
-    user_prompt = f"""
-    ### DATASET CONTEXT
-    - **Target Variable**: "{target_var}" ({problem_type})
-    - **Temporal Column**: {temporal_col if temporal_col else 'None'}
-    - **Problem**: Missing values and potential outliers need handling.
-    
-    ### DIAGNOSTIC SUMMARY
-    - **Top Missing Columns**: {top_missing}
-    - **Skewed Columns**: {[k for k, v in condensed_report['skew_overview'].items() if abs(v) > 2.0]}
-    
-    ### FULL REPORT
-    {json.dumps(condensed_report, indent=2)}
-    
-    Generate the FOUR plans. Ensure `steps` array is populated and `python_code` is valid pandas.
-    """
+    # === 3. USER PROMPT (WITH PRE-FLIGHT TOKEN CHECK) ===
+    user_prompt = _build_treatment_plan_user_prompt(condensed_report, target_var, problem_type, temporal_col)
+    system_tokens = _estimate_tokens(_TREATMENT_PLAN_SYSTEM_PROMPT)
+    # Shrink the report instead of letting the provider truncate the prompt, which shows up
+    # as malformed JSON and burns every retry.
+    while system_tokens + _estimate_tokens(user_prompt) > TREATMENT_PLAN_MAX_INPUT_TOKENS and top_n > 1:
+        top_n //= 2
+        condensed_report = _condense_diagnostic_report(diagnostic_report, top_n=top_n, detail_fields=_PLAN_DETAIL_FIELDS)
+        user_prompt = _build_treatment_plan_user_prompt(condensed_report, target_var, problem_type, temporal_col)
 
     try:
         # Precision mode (low temp) for production safety
-        return _call_openrouter_api(system_prompt, user_prompt, temperature=0.1)
+        plans = _call_openrouter_api(_TREATMENT_PLAN_SYSTEM_PROMPT, user_prompt, temperature=0.1, bypass_cache=bypass_cache,
+                                     max_output_tokens=TREATMENT_PLAN_MAX_OUTPUT_TOKENS, validator=_validate_treatment_plans)
+        if "error" not in plans:
+            _cache_set(near_key, plans)
+        return plans
     except Exception as e:
         # Automatic Fallback
         print(f"AI Service Failed: {e}. Reverting to Failsafe Plan.")
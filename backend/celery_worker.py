@@ -2,14 +2,23 @@ from celery import Celery
 import pandas as pd
 import numpy as np
 import os
-import json
+import io
+import hashlib
+import uuid
+import gc
+import ctypes
+import orjson
 from redis import Redis
+from celery.signals import task_postrun
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from scipy import stats
 from statsmodels.tsa.stattools import acf
-from sklearn.preprocessing import StandardScaler, MinMaxScaler
-from ai_service import get_ai_interpretation, get_treatment_plan_hypotheses
+from ai_service import get_ai_interpretation, get_ai_interpretations, get_treatment_plan_hypotheses
 from data_type_detector import detect_data_type
+from numeric_kernels import (NUMBA_AVAILABLE, standard_scale, minmax_scale, skew_kurtosis,
+                             central_moments, merge_central_moments, shape_from_moments,
+                             column_nunique, frame_nunique, hll_registers, hll_update, hll_estimate)
 
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler, OneHotEncoder, LabelEncoder
@@ -19,184 +28,985 @@ from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
 from sklearn.impute import SimpleImputer
 from sklearn.metrics import roc_auc_score, mean_squared_error
 
-import pandas as pd
-import numpy as np
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    import pyarrow.feather as pa_feather
+except ImportError:
+    pa = pc = pa_csv = pa_feather = None
+
+# === JSON SERIALIZATION ===
+# Cached payloads are written with orjson, which serializes NumPy scalars and
+# contiguous arrays natively; only the pandas types below need a Python callback.
+# NaN and infinity come out as null.
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC
+
+def _to_none(obj):
+    return None
+
+# Exact-type dispatch: one dict lookup per value instead of an isinstance chain.
+# Subclasses are resolved once through the MRO and then remembered here.
+_ORJSON_DEFAULTS = {
+    pd.Timestamp: pd.Timestamp.isoformat,
+    np.ndarray: np.ndarray.tolist,  # non-contiguous or object arrays
+    type(pd.NA): _to_none,
+    type(pd.NaT): _to_none,
+}
+
+def _orjson_default(obj):
+    convert = _ORJSON_DEFAULTS.get(type(obj))
+    if convert is None:
+        if isinstance(obj, np.generic):
+            convert = np.generic.item
+        else:
+            convert = next((fn for cls, fn in _ORJSON_DEFAULTS.items() if isinstance(obj, cls)), None)
+        if convert is None:
+            raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+        _ORJSON_DEFAULTS[type(obj)] = convert
+    return convert(obj)
 
-class NumpyJSONEncoder(json.JSONEncoder):
-    """
-    A comprehensive JSON encoder that handles all common NumPy and pandas data types.
-    This prevents TypeError exceptions for types like numpy.int64, numpy.float64, 
-    pandas.Timestamp, etc.
-    """
-    def default(self, obj):
-        if isinstance(obj, np.integer):
-            return int(obj)
-        if isinstance(obj, np.floating):
-            return float(obj)
-        if isinstance(obj, np.ndarray):
-            return obj.tolist()
-        if isinstance(obj, np.bool_):
-            return bool(obj)
-        if isinstance(obj, pd.Timestamp):
-            return obj.isoformat() # Convert Timestamp to standard ISO string
-        return super(NumpyJSONEncoder, self).default(obj)
+def dumps_json(data) -> bytes:
+    return orjson.dumps(data, default=_orjson_default, option=_ORJSON_OPTIONS)
 
 
 celery_app = Celery('tasks', broker='redis://localhost:6379/0', backend='redis://localhost:6379/0')
+# Each workload gets its own queue so a long diagnostic or AI job cannot hold up the
+# statistics that drive the dashboard; see the Procfile for the matching workers.
+# Everything not listed (route_task, simulations, plan application) stays on 'celery'.
+celery_app.conf.task_routes = {
+    'celery_worker.generate_comprehensive_stats': {'queue': 'stats'},
+    'celery_worker.generate_comprehensive_stats_batch': {'queue': 'stats'},
+    'celery_worker.generate_diagnostic_report': {'queue': 'diag'},
+    'celery_worker.generate_treatment_plans_task': {'queue': 'ai'},
+    'celery_worker.perform_dataset_cleaning_task': {'queue': 'clean'},
+    'celery_worker.perform_dataset_cleaning_task_batch': {'queue': 'clean'},
+}
 redis_cache = Redis(host='localhost', port=6379, db=1, decode_responses=True)
 
-@celery_app.task(time_limit=900) # 15 minute time limit for huge files
-def generate_comprehensive_stats(file_path: str):
-    # This function remains unchanged.
+# === MEMORY BETWEEN TASKS ===
+# A prefork worker process lives across many tasks. Frames, masks and Arrow buffers are
+# freed when a task returns, but glibc keeps the pages on its heap, so every child
+# would stay at the peak of the largest file it ever profiled. After each task the
+# cyclic garbage is collected and the free heap handed back to the OS.
+try:
+    _libc = ctypes.CDLL("libc.so.6")
+except OSError:
+    _libc = None
+
+@task_postrun.connect
+def _release_task_memory(**kwargs):
+    gc.collect()
+    if _libc is not None:
+        _libc.malloc_trim(0)
+
+# === CSV LOADING ===
+# The pandas default NA markers (plus 'None'); pyarrow needs them spelled out.
+COMMON_NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+                    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'n/a',
+                    'nan', 'null', 'None']
+
+def _arrow_csv_options(file_path: str, na_values: list, skip_bad_lines: bool, usecols: list = None) -> tuple:
+    parse_options = pa_csv.ParseOptions(invalid_row_handler=(lambda row: 'skip') if skip_bad_lines else None)
+    include_columns = list(usecols) if usecols is not None else []
+    convert_options = pa_csv.ConvertOptions(null_values=na_values, strings_can_be_null=True, include_columns=include_columns)
+
+    # Arrow infers column types from the first block. Dates and timestamps are forced
+    # back to text so they reach detect_data_type (and any rewrite) exactly as the C
+    # engine would deliver them.
+    schema = pa_csv.open_csv(file_path, parse_options=parse_options, convert_options=convert_options).schema
+    if len(set(schema.names)) != len(schema.names):
+        raise ValueError("duplicate column names")
+    temporal = {field.name: pa.string() for field in schema if pa.types.is_temporal(field.type)}
+    if temporal:
+        convert_options = pa_csv.ConvertOptions(null_values=na_values, strings_can_be_null=True,
+                                                include_columns=include_columns, column_types=temporal)
+    return parse_options, convert_options
+
+def _read_csv_arrow(file_path: str, na_values: list, skip_bad_lines: bool, usecols: list = None) -> "pa.Table":
+    parse_options, convert_options = _arrow_csv_options(file_path, na_values, skip_bad_lines, usecols)
+    return pa_csv.read_csv(file_path, parse_options=parse_options, convert_options=convert_options)
+
+def _is_parquet(file_path: str) -> bool:
+    return file_path.lower().endswith('.parquet')
+
+def read_dataset_table(file_path: str, **read_csv_kwargs):
+    """
+    Reads a dataset into an Arrow Table with the same NA and bad-line handling that
+    pd.read_csv(file_path, **read_csv_kwargs) would apply. Returns None when pyarrow
+    is missing or cannot handle the file. Parquet files are read as they are, with
+    only usecols applied.
+    """
+    if pa_csv is None:
+        return None
+    if _is_parquet(file_path):
+        import pyarrow.parquet as pq
+        return pq.read_table(file_path, columns=read_csv_kwargs.get('usecols'))
     try:
-        file_name = os.path.basename(file_path)
-        cache_key = f"statistics:{file_name}"
-        
-        common_na_values = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
-                            '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'n/a',
-                            'nan', 'null', 'None']
-        
-        df = pd.read_csv(file_path, on_bad_lines='skip', na_values=common_na_values)
+        na_values = list(dict.fromkeys(COMMON_NA_VALUES + list(read_csv_kwargs.get('na_values') or [])))
+        return _read_csv_arrow(file_path, na_values, read_csv_kwargs.get('on_bad_lines') == 'skip',
+                               read_csv_kwargs.get('usecols'))
+    except Exception as e:
+        print(f"Info: pyarrow could not read {file_path} ({e}); using the C engine.")
+        return None
 
-        if df.empty:
-            redis_cache.delete(cache_key)
-            return
-
-        # --- Perform all calculations in one pass ---
-        rows, columns = df.shape
-        missing_cells = df.isnull().sum().sum()
-        total_cells = rows * columns if rows > 0 else 1
-        missing_pct = (missing_cells / total_cells) * 100
-        duplicate_rows = df.duplicated().sum()
-        duplicate_pct = (duplicate_rows / rows) * 100 if rows > 0 else 0
-        quality_score = max(0, 100 - missing_pct - duplicate_pct)
-        status = "RAW"
-        if quality_score > 90: status = "CLEANED"
-        elif quality_score > 60: status = "CLEANING"
-        
-        column_stats = []
-        numeric_column_count = 0
-        text_column_count = 0
+def read_dataset(file_path: str, **read_csv_kwargs) -> pd.DataFrame:
+    """
+    Loads a dataset with pyarrow's multithreaded CSV reader, falling back to
+    pd.read_csv(file_path, **read_csv_kwargs) whenever pyarrow is missing or
+    cannot handle the file. Columns come back as regular NumPy/object dtypes.
+    """
+    table = read_dataset_table(file_path, **read_csv_kwargs)
+    if table is not None:
+        # One block per column, each Arrow buffer released as soon as it is converted:
+        # peak memory stays near one copy of the data instead of two.
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+    if _is_parquet(file_path):
+        return pd.read_parquet(file_path, columns=read_csv_kwargs.get('usecols'))
+    return pd.read_csv(file_path, **read_csv_kwargs)
+
+def _peek_dataset(file_path: str, nrows: int) -> pd.DataFrame:
+    """
+    The first nrows rows of a dataset (nrows=0 gives just the header).
+    """
+    if _is_parquet(file_path):
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(file_path)
+        batches = [next(parquet_file.iter_batches(batch_size=nrows), None)] if nrows else []
+        return pa.Table.from_batches([b for b in batches if b is not None], schema=parquet_file.schema_arrow).to_pandas()
+    return pd.read_csv(file_path, nrows=nrows)
+
+def _flatten_nested(column: "pa.ChunkedArray") -> "pa.ChunkedArray":
+    """
+    List, struct and map columns (Parquet only) as JSON text. Arrow can neither group
+    on nor write CSV from nested types; equal values keep equal text.
+    """
+    if not pa.types.is_nested(column.type):
+        return column
+    return pa.chunked_array([pa.array(
+        [None if value is None else orjson.dumps(value, default=str).decode('utf-8') for value in column.to_pylist()],
+        type=pa.string()
+    )])
 
-        for header in df.columns:
-            series = df[header]
-            clean_series = series.dropna()
-            null_count = int(series.isnull().sum())
-            data_type = detect_data_type(series)
+PARQUET_CSV_BATCH_ROWS = 65536
 
-            if data_type in ['integer', 'float', 'identifier']:
-                numeric_column_count += 1
-            else:
-                text_column_count += 1
-            
-            stat = {
-                "column": header, "dataType": data_type, "nullCount": null_count,
-                "nullPercentage": (null_count / rows) * 100 if rows > 0 else 0,
-                "uniqueValues": series.nunique(), "totalValues": len(clean_series),
-                "mean": "N/A", "median": "N/A", "mode": "N/A"
-            }
-            if data_type in ['integer', 'float'] and not clean_series.empty:
-                stat["mean"] = round(clean_series.mean(), 2)
-                stat["median"] = round(clean_series.median(), 2)
-                modes = clean_series.mode()
-                if not modes.empty:
-                    stat["mode"] = ", ".join(modes.astype(str).tolist())
-            column_stats.append(stat)
-
-        comprehensive_result = {
-            "filename": file_name,
-            "lastModified": datetime.fromtimestamp(os.path.getmtime(file_path)).strftime('%Y-%m-%d'),
-            "size": f"{os.path.getsize(file_path) / (1024*1024):.1f}MB",
-            "rows": rows, "columns": columns, "totalCells": total_cells,
-            "status": status, "qualityScore": round(quality_score),
-            "missing_pct": round(missing_pct), "duplicates_pct": round(duplicate_pct),
-            "overallNullCount": int(missing_cells),
-            "columnStats": column_stats,
-            "numericColumnCount": numeric_column_count,
-            "textColumnCount": text_column_count
+def iter_parquet_csv(file_path: str):
+    """
+    Yields a Parquet dataset as CSV bytes, one record batch at a time, for clients that
+    only parse CSV. Nested columns are written as JSON text.
+    """
+    import pyarrow.parquet as pq
+    parquet_file = pq.ParquetFile(file_path)
+    schema = pa.schema([pa.field(field.name, pa.string()) if pa.types.is_nested(field.type) else field
+                        for field in parquet_file.schema_arrow])
+    sink = io.BytesIO()
+    with pa_csv.CSVWriter(sink, schema) as writer:
+        for batch in parquet_file.iter_batches(batch_size=PARQUET_CSV_BATCH_ROWS):
+            table = pa.Table.from_batches([batch])
+            writer.write_table(pa.table([_flatten_nested(column) for column in table.columns], schema=schema))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    # A file without rows still gets its header line.
+    yield sink.getvalue()
+
+def _compact_text_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converts text columns in place for the read-only analysis tasks: mostly-repeated
+    values become category, other Python-object columns Arrow-backed strings. nunique,
+    mode and .str operations then hash and compare in C instead of on PyObjects.
+    """
+    if pa is None:
+        return df
+
+    def compacted(header):
+        # Builds the converted column only; the frame is assigned to afterwards.
+        series = df[header]
+        if not (pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype)):
+            return None
+        try:
+            if len(series) and column_nunique(series) / len(series) < 0.5:
+                return series.astype('category')
+            elif pd.api.types.is_object_dtype(series.dtype):
+                return series.astype('string[pyarrow]')
+        except (TypeError, ValueError):
+            pass
+        return None
+
+    headers = list(df.columns)
+    for header, series in zip(headers, _map_columns(compacted, headers)):
+        if series is not None:
+            df[header] = series
+    return df
+
+def _table_duplicate_rows(table: "pa.Table") -> int:
+    """
+    df.duplicated().sum() computed with Arrow kernels on the table itself.
+    """
+    # Grouping on every column leaves one row per distinct record; nulls group together,
+    # matching df.duplicated(). All-null columns cannot be group keys and cannot tell
+    # rows apart anyway, so they are left out; nested Parquet columns are grouped on
+    # their JSON text.
+    keys = [field.name for field in table.schema if not pa.types.is_null(field.type)]
+    if not keys:
+        return max(table.num_rows - 1, 0)
+    key_table = pa.table([_flatten_nested(table[name]) for name in keys], names=keys)
+    return table.num_rows - key_table.group_by(keys).aggregate([]).num_rows
+
+# === PARSED DATAFRAME CACHE ===
+# route_task reloads the same file for every column action, and the cleaning and
+# diagnostic tasks parse it again. The parsed frame is kept
+# in Redis as Feather (Arrow IPC), keyed by path + mtime + size so any rewrite makes
+# the old entry unreachable. Binary values need their own db without decode_responses.
+df_cache = Redis(host='localhost', port=6379, db=2)
+DF_CACHE_TTL_SECONDS = 3600
+DF_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+def _file_signature(file_path: str) -> str:
+    stat = os.stat(file_path)
+    return f"{os.path.abspath(file_path)}:{stat.st_mtime_ns}:{stat.st_size}"
+
+def _df_cache_key(file_path: str) -> str:
+    return f"df:{_file_signature(file_path)}"
+
+def load_dataset_cached(file_path: str, usecols: list = None, **read_csv_kwargs) -> pd.DataFrame:
+    """
+    read_dataset(file_path, usecols=..., **read_csv_kwargs) with a Feather round-trip
+    through Redis in front of it. Column projections and non-default read options are
+    cached under their own keys.
+    """
+    read_kwargs = dict(read_csv_kwargs)
+    if usecols is not None:
+        read_kwargs["usecols"] = usecols
+    if pa is None:
+        return read_dataset(file_path, **read_kwargs)
+
+    key = _df_cache_key(file_path)
+    if read_kwargs:
+        options = orjson.dumps(read_kwargs, default=str, option=orjson.OPT_SORT_KEYS)
+        key += ":" + hashlib.sha1(options).hexdigest()[:16]
+    try:
+        blob = df_cache.get(key)
+        if blob is not None:
+            return pd.read_feather(io.BytesIO(blob))
+    except Exception as e:
+        print(f"Info: DataFrame cache read failed for {file_path}: {e}")
+
+    df = read_dataset(file_path, **read_kwargs)
+    try:
+        buffer = io.BytesIO()
+        df.to_feather(buffer)
+        if buffer.tell() <= DF_CACHE_MAX_BYTES:
+            df_cache.set(key, buffer.getvalue(), ex=DF_CACHE_TTL_SECONDS)
+    except Exception as e:
+        # Mixed-type object columns cannot be written as Arrow; just skip caching.
+        print(f"Info: DataFrame cache write skipped for {file_path}: {e}")
+    return df
+
+# === COLUMN TYPE CACHE ===
+# detect_data_type is pure with respect to the file contents, so its verdicts are kept
+# per file version: in-process first, then in a Redis hash shared by all workers.
+COLUMN_TYPES_TTL_SECONDS = 86400
+_COLUMN_TYPES_MEMO_MAX_FILES = 128
+_column_types_memo: dict = {}
+
+def _column_types_key(file_path: str) -> str:
+    return f"coltypes:{_file_signature(file_path)}"
+
+def load_column_types(file_path: str) -> dict:
+    """
+    Returns the cached {column: data type} for the current version of the file.
+    """
+    key = _column_types_key(file_path)
+    types = _column_types_memo.get(key)
+    if types is None:
+        try:
+            types = redis_cache.hgetall(key)
+        except Exception as e:
+            print(f"Info: column type cache read failed for {file_path}: {e}")
+            return {}
+        _remember_column_types(key, types)
+    return dict(types)
+
+def save_column_types(file_path: str, types: dict):
+    if not types:
+        return
+    key = _column_types_key(file_path)
+    _remember_column_types(key, {**_column_types_memo.get(key, {}), **types})
+    try:
+        with redis_cache.pipeline(transaction=False) as pipe:
+            pipe.hset(key, mapping=types)
+            pipe.expire(key, COLUMN_TYPES_TTL_SECONDS)
+            pipe.execute()
+    except Exception as e:
+        print(f"Info: column type cache write failed for {file_path}: {e}")
+
+def _remember_column_types(key: str, types: dict):
+    if key not in _column_types_memo and len(_column_types_memo) >= _COLUMN_TYPES_MEMO_MAX_FILES:
+        _column_types_memo.pop(next(iter(_column_types_memo)))
+    _column_types_memo[key] = types
+
+def cached_detect_data_type(file_path: str, df: pd.DataFrame, column_name: str) -> str:
+    data_type = load_column_types(file_path).get(column_name)
+    if data_type is None:
+        data_type = detect_data_type(df[column_name])
+        save_column_types(file_path, {column_name: data_type})
+    return data_type
+
+# === COLUMN PROFILE CACHE ===
+# The statistics task, the diagnostic report and route_task's diagnosis all count the
+# same nulls and distinct values. Per-column figures ({"missing_count", "unique_values",
+# and "mean"/"median" for numeric columns}) are kept per file version in a Redis hash.
+COLUMN_PROFILES_TTL_SECONDS = 86400
+
+def _column_profiles_key(file_path: str) -> str:
+    return f"colprof:{_file_signature(file_path)}"
+
+def load_column_profiles(file_path: str, columns: list) -> dict:
+    """
+    Returns {column: cached profile} for those of columns cached for the current
+    version of the file.
+    """
+    columns = list(columns)
+    if not columns:
+        return {}
+    try:
+        raw = redis_cache.hmget(_column_profiles_key(file_path), columns)
+    except Exception as e:
+        print(f"Info: column profile cache read failed for {file_path}: {e}")
+        return {}
+    return {column: orjson.loads(value) for column, value in zip(columns, raw) if value is not None}
+
+def save_column_profiles(file_path: str, profiles: dict):
+    if not profiles:
+        return
+    key = _column_profiles_key(file_path)
+    try:
+        with redis_cache.pipeline(transaction=False) as pipe:
+            pipe.hset(key, mapping={column: dumps_json(profile) for column, profile in profiles.items()})
+            pipe.expire(key, COLUMN_PROFILES_TTL_SECONDS)
+            pipe.execute()
+    except Exception as e:
+        print(f"Info: column profile cache write failed for {file_path}: {e}")
+
+def _float_csv_text(table: "pa.Table") -> "pa.Table":
+    """
+    Arrow writes an integral float as "5" where DataFrame.to_csv writes "5.0", so a
+    float column with no nulls and only whole values would parse back as int64 after
+    a rewrite. Those columns are written as text with the ".0" kept (quoted, like every
+    Arrow string value); everything else passes through.
+    """
+    for i, field in enumerate(table.schema):
+        column = table.column(i)
+        if not pa.types.is_floating(field.type) or column.null_count or not len(column):
+            continue
+        if not pc.all(pc.and_(pc.is_finite(column), pc.equal(pc.floor(column), column))).as_py():
+            continue
+        text = pc.cast(column, pa.string())
+        if pc.any(pc.match_substring(text, "e")).as_py():
+            continue
+        table = table.set_column(i, field.name, pc.binary_join_element_wise(text, ".0", ""))
+    return table
+
+def _write_csv(table: "pa.Table", file_path: str):
+    pa_csv.write_csv(_float_csv_text(table), file_path,
+                     write_options=pa_csv.WriteOptions(include_header=True, quoting_style='needed'))
+
+def _write_table(df, file_path: str):
+    """
+    Picks the writer by extension. CSVs go through pyarrow's multithreaded C++ writer
+    (whole-valued float columns via _float_csv_text), falling back to DataFrame.to_csv
+    for frames Arrow cannot represent.
+    Arrow Tables are written as they are. Returns the Arrow Table behind a CSV
+    write, or None.
+    """
+    if pa is not None and isinstance(df, pa.Table):
+        if file_path.lower().endswith('.parquet'):
+            import pyarrow.parquet as pq
+            pq.write_table(df, file_path)
+            return None
+        _write_csv(df, file_path)
+        return df
+    if file_path.lower().endswith('.parquet'):
+        df.to_parquet(file_path, index=False)
+        return None
+    if pa_csv is not None:
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            _write_csv(table, file_path)
+            return table
+        except Exception as e:
+            print(f"Info: pyarrow could not write {file_path} ({e}); using DataFrame.to_csv.")
+    df.to_csv(file_path, index=False)
+    return None
+
+def _as_reparsed(table: "pa.Table") -> "pa.Table":
+    """
+    Gives a just-written table the types read_dataset would infer when parsing the
+    CSV again: all-null columns become null, integers int64 and floats float64
+    parsed from the text that was written.
+    """
+    for i, field in enumerate(table.schema):
+        column = table.column(i)
+        if column.null_count == len(column):
+            if len(column) and not pa.types.is_null(field.type):
+                table = table.set_column(i, field.name, pa.nulls(len(column)))
+        elif pa.types.is_integer(field.type) and field.type != pa.int64():
+            table = table.set_column(i, field.name, pc.cast(column, pa.int64()))
+        elif pa.types.is_floating(field.type) and field.type != pa.float64():
+            table = table.set_column(i, field.name, pc.cast(pc.cast(column, pa.string()), pa.float64()))
+    return table.replace_schema_metadata(None)
+
+def write_dataset(df, file_path: str):
+    """
+    Overwrites a dataset on disk (from a DataFrame or an Arrow Table), dropping its
+    cached parse first. The written table is cached as the new version's parse, so
+    the next job on the file does not read the CSV back.
+    """
+    if os.path.exists(file_path):
+        df_cache.delete(_df_cache_key(file_path))
+    table = _write_table(df, file_path)
+    if table is None:
+        return
+    try:
+        buffer = io.BytesIO()
+        pa_feather.write_feather(_as_reparsed(table), buffer)
+        if buffer.tell() <= DF_CACHE_MAX_BYTES:
+            df_cache.set(_df_cache_key(file_path), buffer.getvalue(), ex=DF_CACHE_TTL_SECONDS)
+    except Exception as e:
+        print(f"Info: DataFrame cache write skipped for {file_path}: {e}")
+
+# Per-column work (detect_data_type, mode) is independent across columns. NumPy and
+# pandas release the GIL inside their kernels, so a thread pool overlaps it.
+COLUMN_WORKERS = min(8, os.cpu_count() or 1)
+_PARALLEL_MIN_COLUMNS = 8
+
+def _map_columns(func, columns) -> list:
+    """
+    [func(c) for c in columns], spread over a thread pool for wide frames.
+    """
+    columns = list(columns)
+    if COLUMN_WORKERS <= 1 or len(columns) < _PARALLEL_MIN_COLUMNS:
+        return [func(c) for c in columns]
+    with ThreadPoolExecutor(max_workers=COLUMN_WORKERS) as pool:
+        return list(pool.map(func, columns))
+
+_HASHED_DUPLICATE_MIN_ROWS = 100_000
+
+def _count_duplicate_rows(df: pd.DataFrame) -> int:
+    """
+    Same count as df.duplicated().sum(). Large frames are first reduced to one 64-bit
+    hash per row, so only rows x 8 bytes are held and no boolean mask is built; a
+    collision would need two distinct rows with equal hashes (p ~ rows^2 / 2^65).
+    """
+    if len(df) < _HASHED_DUPLICATE_MIN_ROWS:
+        return int(df.duplicated().sum())
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return int(len(row_hashes) - len(np.unique(row_hashes)))
+
+def _quality_status(quality_score: float) -> str:
+    status = "RAW"
+    if quality_score > 90: status = "CLEANED"
+    elif quality_score > 60: status = "CLEANING"
+    return status
+
+def _score_quality(result: dict, components: tuple):
+    """
+    Fills status and qualityScore from the unrounded (missing, duplicate)
+    percentages returned by _build_comprehensive_stats.
+    """
+    quality_score = max(0, 100 - sum(components))
+    result["status"] = _quality_status(quality_score)
+    result["qualityScore"] = round(quality_score)
+
+def _score_quality_batch(stats_list: list, components: list):
+    """
+    _score_quality for a whole batch: one vectorised clip/select over every file's
+    percentages instead of a per-file if-chain.
+    """
+    if not stats_list:
+        return
+    missing, duplicate = np.asarray(components, dtype=np.float64).T
+    scores = np.clip(100 - missing - duplicate, 0, None)
+    statuses = np.select([scores > 90, scores > 60], ["CLEANED", "CLEANING"], default="RAW")
+    rounded = np.round(scores).astype(int)
+    for entry, status, score in zip(stats_list, statuses.tolist(), rounded.tolist()):
+        entry["status"] = status
+        entry["qualityScore"] = score
+
+MODE_MAX_UNIQUE = 1000
+
+def _format_modes(series: pd.Series, numeric: bool) -> str:
+    """
+    ", ".join(series.mode().astype(str)): every most frequent value, in sorted order.
+    Numeric columns are counted with one np.unique pass over the non-null values.
+    """
+    if not numeric:
+        modes = series.mode()
+        return ", ".join(modes.astype(str).tolist()) if not modes.empty else "N/A"
+    values, counts = np.unique(series.dropna().to_numpy(), return_counts=True)
+    return ", ".join(str(value) for value in values[counts == counts.max()])
+
+def _build_comprehensive_stats(file_path: str):
+    """
+    Computes the statistics payload cached under statistics:{file}, leaving status and
+    qualityScore to _score_quality. Returns (payload, (missing_pct, duplicate_pct)),
+    or None for an empty dataset.
+    """
+    read_kwargs = {"on_bad_lines": 'skip', "na_values": COMMON_NA_VALUES}
+    table = read_dataset_table(file_path, **read_kwargs)
+    df = table.to_pandas() if table is not None else read_dataset(file_path, **read_kwargs)
+    return _frame_statistics(file_path, df, table)
+
+def _frame_statistics(file_path: str, df: pd.DataFrame, table: "pa.Table" = None):
+    """
+    _build_comprehensive_stats on a frame already in memory. With the Arrow table it
+    was converted from, duplicate rows are counted on the table.
+    Text columns of df are compacted in place.
+    """
+    file_name = os.path.basename(file_path)
+    if df.empty:
+        return None
+
+    # --- Perform all calculations in one pass ---
+    rows, columns = df.shape
+    total_cells = rows * columns if rows > 0 else 1
+    # The null mask is built once; the per-column counts below and the total reuse it.
+    null_counts = df.isnull().sum()
+    missing_cells = int(null_counts.sum())
+    # Dataset-level count straight from the Arrow columns when the table is at hand.
+    duplicate_rows = _table_duplicate_rows(table) if table is not None else _count_duplicate_rows(df)
+    _compact_text_columns(df)
+    missing_pct = (missing_cells / total_cells) * 100
+    duplicate_pct = (duplicate_rows / rows) * 100 if rows > 0 else 0
+
+    # Frame-level aggregates: one call per statistic instead of one per column.
+    value_counts = rows - null_counts
+    numeric_df = df.select_dtypes(include=[np.number, 'bool'])
+    numeric_columns = set(numeric_df.columns)
+    cached_profiles = load_column_profiles(file_path, df.columns)
+    if len(cached_profiles) == columns and all(
+            "mean" in cached_profiles[header] for header in numeric_columns if value_counts[header] > 0):
+        # This file version was already profiled: skip the distinct counts and numeric scans.
+        unique_counts = pd.Series({h: p["unique_values"] for h, p in cached_profiles.items()}, dtype=np.int64)
+        means = pd.Series({h: p["mean"] for h, p in cached_profiles.items() if "mean" in p}, dtype=np.float64)
+        medians = pd.Series({h: p["median"] for h, p in cached_profiles.items() if "median" in p}, dtype=np.float64)
+    else:
+        unique_counts = frame_nunique(df, _map_columns)
+        means = numeric_df.mean().round(2)
+        medians = numeric_df.median().round(2)
+        profiles = {}
+        for header in df.columns:
+            profile = {"missing_count": int(null_counts[header]), "unique_values": int(unique_counts[header])}
+            if header in numeric_columns and value_counts[header] > 0:
+                profile["mean"] = float(means[header])
+                profile["median"] = float(medians[header])
+            profiles[header] = profile
+        save_column_profiles(file_path, profiles)
+
+    def column_stat(header) -> dict:
+        # Reads only this column and the prebuilt aggregates, so it is safe to run on a thread.
+        null_count = int(null_counts[header])
+        total_values = int(value_counts[header])
+        data_type = known_types.get(header) or detect_data_type(df[header])
+        stat = {
+            "column": header, "dataType": data_type, "nullCount": null_count,
+            "nullPercentage": (null_count / rows) * 100 if rows > 0 else 0,
+            "uniqueValues": unique_counts[header], "totalValues": total_values,
+            "mean": "N/A", "median": "N/A", "mode": "N/A"
         }
+        if data_type in ['integer', 'float'] and total_values > 0:
+            # Numeric-looking text columns have no frame-level mean/median.
+            if header in numeric_columns:
+                stat["mean"] = means[header]
+                stat["median"] = medians[header]
+        # A mode is only meaningful for integers with few distinct values; continuous
+        # floats and near-unique integers report N/A instead of paying for the count.
+        if data_type == 'integer' and total_values > 0 and unique_counts[header] < MODE_MAX_UNIQUE:
+            stat["mode"] = _format_modes(df[header], header in numeric_columns)
+        return stat
+
+    known_types = load_column_types(file_path)
+    column_stats = _map_columns(column_stat, df.columns)
+    detected_types = {stat["column"]: stat["dataType"] for stat in column_stats}
+    if detected_types != known_types:
+        save_column_types(file_path, detected_types)
+    numeric_column_count = sum(1 for stat in column_stats if stat["dataType"] in ['integer', 'float', 'identifier'])
+    text_column_count = len(column_stats) - numeric_column_count
+
+    comprehensive_result = {
+        "filename": file_name,
+        "lastModified": datetime.fromtimestamp(os.path.getmtime(file_path)).strftime('%Y-%m-%d'),
+        "size": f"{os.path.getsize(file_path) / (1024*1024):.1f}MB",
+        "rows": rows, "columns": columns, "totalCells": total_cells,
+        "status": None, "qualityScore": None,
+        "missing_pct": round(missing_pct), "duplicates_pct": round(duplicate_pct),
+        "overallNullCount": int(missing_cells),
+        "columnStats": column_stats,
+        "numericColumnCount": numeric_column_count,
+        "textColumnCount": text_column_count
+    }
+    return comprehensive_result, (missing_pct, duplicate_pct)
+
+# Filenames with a statistics:{file} entry, so the dashboard can list them with
+# SMEMBERS instead of walking the keyspace. Kept in step with every write and delete,
+# and outside the statistics: namespace so no dataset name can collide with it.
+STATISTICS_INDEX_KEY = "index:statistics"
 
-        redis_cache.set(cache_key, json.dumps(comprehensive_result, cls=NumpyJSONEncoder), ex=86400)
-        return comprehensive_result
+def dashboard_summary(result: dict) -> dict:
+    """
+    The dashboard row for one file's statistics. It is cached next to them under
+    summary:{file}, so the dashboard serves stored rows without reshaping anything.
+    """
+    return {
+        "id": result["filename"], "filename": result["filename"], "size": result["size"],
+        "rows": result["rows"], "columns": result["columns"], "status": result["status"],
+        "qualityScore": result["qualityScore"], "missing": result["missing_pct"],
+        "duplicates": result["duplicates_pct"], "inconsistencies": 0,
+        "lastModified": result["lastModified"]
+    }
+
+# === DISPATCH LOCKS ===
+# lock:{cache key} is taken by the API before it enqueues a job that fills that cache
+# entry, so an upload followed by quick polls enqueues the job once. The lock holds a
+# random token that is handed to the job, which drops the lock when it finishes,
+# whatever the outcome, but only while the token still matches: a job started without
+# the lock (refresh, explicit generation) or one that outlived its TTL never deletes
+# a lock some later dispatch took. The TTL covers a worker that died and is at least
+# the longest time_limit of the tasks it guards.
+DISPATCH_LOCK_SECONDS = 1800
+
+_release_lock_script = redis_cache.register_script("""
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+""")
+
+def acquire_dispatch_lock(cache_key: str):
+    """
+    Returns the lock's token, or None when another dispatch already holds it.
+    """
+    token = uuid.uuid4().hex
+    return token if redis_cache.set(f"lock:{cache_key}", token, nx=True, ex=DISPATCH_LOCK_SECONDS) else None
+
+def acquire_dispatch_locks(cache_keys: list) -> dict:
+    """
+    acquire_dispatch_lock for many keys in one round-trip. Returns {cache_key: token}
+    for the locks that were taken.
+    """
+    tokens = {cache_key: uuid.uuid4().hex for cache_key in cache_keys}
+    with redis_cache.pipeline(transaction=False) as pipe:
+        for cache_key, token in tokens.items():
+            pipe.set(f"lock:{cache_key}", token, nx=True, ex=DISPATCH_LOCK_SECONDS)
+        acquired = pipe.execute()
+    return {cache_key: token for (cache_key, token), locked in zip(tokens.items(), acquired) if locked}
+
+def release_dispatch_lock(cache_key: str, token: str = None, client=None):
+    """
+    Deletes lock:{cache_key} if it still holds `token`. Without a token (the job was
+    not dispatched under the lock) nothing is released. `client` may be a pipeline.
+    """
+    if token is not None:
+        _release_lock_script(keys=[f"lock:{cache_key}"], args=[token], client=client or redis_cache)
+
+def _store_statistics(file_path: str, built):
+    """
+    Scores a _build_comprehensive_stats result and writes its statistics and summary
+    entries, or drops them when the dataset is empty. Returns the payload or None.
+    """
+    file_name = os.path.basename(file_path)
+    with redis_cache.pipeline(transaction=False) as pipe:
+        if built is None:
+            pipe.delete(f"statistics:{file_name}", f"summary:{file_name}")
+            pipe.srem(STATISTICS_INDEX_KEY, file_name)
+            pipe.execute()
+            return None
+        comprehensive_result, components = built
+        _score_quality(comprehensive_result, components)
+        pipe.set(f"statistics:{file_name}", dumps_json(comprehensive_result), ex=86400)
+        pipe.set(f"summary:{file_name}", dumps_json(dashboard_summary(comprehensive_result)), ex=86400)
+        pipe.sadd(STATISTICS_INDEX_KEY, file_name)
+        pipe.execute()
+    return comprehensive_result
+
+# The statistics and diagnostics tasks are run for the cache entries they write, so
+# their return values are not stored; callers that poll a job opt back in per call.
+@celery_app.task(time_limit=900, ignore_result=True) # 15 minute time limit for huge files
+def generate_comprehensive_stats(file_path: str, lock_token: str = None):
+    cache_key = f"statistics:{os.path.basename(file_path)}"
+    try:
+        return _store_statistics(file_path, _build_comprehensive_stats(file_path))
     except Exception as e:
         print(f"CRITICAL ERROR in generate_comprehensive_stats for {file_path}: {e}")
         raise e
+    finally:
+        release_dispatch_lock(cache_key, lock_token)
 
-@celery_app.task(time_limit=1800)
-def generate_diagnostic_report(file_path: str):
-    try:
+@celery_app.task(time_limit=1800, ignore_result=True)
+def generate_comprehensive_stats_batch(file_paths: list, lock_tokens: dict = None):
+    """
+    Computes statistics for several files in one task and writes all of their cache
+    entries in a single pipelined round-trip. A failing file is logged and skipped.
+    lock_tokens maps file names to the dispatch-lock tokens to release.
+    """
+    processed, failed, empty = [], [], []
+    built_results, components = [], []
+    for file_path in file_paths:
         file_name = os.path.basename(file_path)
-        cache_key = f"diagnostics:{file_name}"
-
-        df = pd.read_csv(
-            file_path,
-            on_bad_lines='skip',
-            na_values=['', 'NA', 'N/A', 'NULL', 'None', 'nan', 'NaN'],
-            encoding='utf-8',
-            low_memory=False
-        )
+        try:
+            built = _build_comprehensive_stats(file_path)
+        except Exception as e:
+            print(f"CRITICAL ERROR in generate_comprehensive_stats_batch for {file_path}: {e}")
+            failed.append(file_name)
+            continue
 
-        if df.empty:
-            redis_cache.delete(cache_key)
-            return {"status": "ERROR", "message": "Dataset is empty."}
+        if built is None:
+            empty.append(file_name)
+        else:
+            built_results.append(built[0])
+            components.append(built[1])
+        processed.append(file_name)
+
+    # Score every file at once, now that all of their percentages are known.
+    _score_quality_batch(built_results, components)
+
+    with redis_cache.pipeline(transaction=False) as pipe:
+        for file_name in empty:
+            pipe.delete(f"statistics:{file_name}", f"summary:{file_name}")
+        if empty:
+            pipe.srem(STATISTICS_INDEX_KEY, *empty)
+        for comprehensive_result in built_results:
+            pipe.set(
+                f"statistics:{comprehensive_result['filename']}",
+                dumps_json(comprehensive_result),
+                ex=86400
+            )
+            pipe.set(
+                f"summary:{comprehensive_result['filename']}",
+                dumps_json(dashboard_summary(comprehensive_result)),
+                ex=86400
+            )
+        if built_results:
+            pipe.sadd(STATISTICS_INDEX_KEY, *(result['filename'] for result in built_results))
+        for file_name, token in (lock_tokens or {}).items():
+            release_dispatch_lock(f"statistics:{file_name}", token, client=pipe)
+        pipe.execute()
+    return {"status": "SUCCESS", "processed": processed, "failed": failed}
+
+# === STREAMED DIAGNOSTICS ===
+# Files at least this large are profiled batch by batch so peak memory stays at one
+# block plus the per-column accumulators (distinct values, moments, 8-byte row hashes).
+# A column's distinct values are kept exactly up to STREAM_EXACT_DISTINCT_LIMIT; past
+# that the set is folded into a HyperLogLog sketch, so re-merging it every batch stays
+# bounded instead of growing with the file.
+STREAMING_MIN_BYTES = 512 * 1024 * 1024
+STREAM_BLOCK_SIZE = 16 * 1024 * 1024
+STREAM_EXACT_DISTINCT_LIMIT = 100_000
+DIAGNOSTIC_NA_VALUES = ['', 'NA', 'N/A', 'NULL', 'None', 'nan', 'NaN']
+
+def _stream_diagnostic_report(file_path: str):
+    """
+    _build_diagnostic_report computed over Arrow record batches without holding the
+    whole table. Shape statistics come from merged central moments and duplicates are
+    counted on row hashes the way _count_duplicate_rows does for large frames. Distinct
+    counts are exact up to STREAM_EXACT_DISTINCT_LIMIT and HyperLogLog estimates
+    (~0.8% error) above it, like column_nunique on long columns. Raises when the
+    reader cannot stream the file (e.g. a column changes type in a later block).
+    """
+    na_values = list(dict.fromkeys(COMMON_NA_VALUES + DIAGNOSTIC_NA_VALUES))
+    parse_options, convert_options = _arrow_csv_options(file_path, na_values, True)
+    reader = pa_csv.open_csv(file_path, read_options=pa_csv.ReadOptions(block_size=STREAM_BLOCK_SIZE),
+                             parse_options=parse_options, convert_options=convert_options)
+    fields = list(reader.schema)
+    numeric_types = (pa.types.is_integer, pa.types.is_floating)
+    is_numeric = [any(check(field.type) for check in numeric_types) for field in fields]
+
+    rows = 0
+    null_counts = [0] * len(fields)
+    distinct = [None] * len(fields)
+    sketches = [None] * len(fields)
+    moments = [central_moments(np.empty(0)) for _ in fields]
+    row_hashes = []
+    for batch in reader:
+        rows += batch.num_rows
+        hash_columns = {}
+        for i, column in enumerate(batch.columns):
+            null_counts[i] += pc.sum(pc.is_null(column, nan_is_null=True)).as_py() or 0
+            present = pc.drop_null(column)
+            batch_distinct = pc.unique(present)
+            if sketches[i] is not None:
+                hll_update(sketches[i], batch_distinct.to_numpy(zero_copy_only=False))
+            else:
+                distinct[i] = batch_distinct if distinct[i] is None else pc.unique(pa.concat_arrays([distinct[i], batch_distinct]))
+                if len(distinct[i]) > STREAM_EXACT_DISTINCT_LIMIT:
+                    sketches[i] = hll_registers()
+                    hll_update(sketches[i], distinct[i].to_numpy(zero_copy_only=False))
+                    distinct[i] = None
+            if is_numeric[i]:
+                values = pc.cast(present, pa.float64()).to_numpy()
+                moments[i] = merge_central_moments(moments[i], central_moments(values[~np.isnan(values)]))
+            # Ints and bools gain nulls (and so change pandas dtype) batch by batch;
+            # hashing them as float64 keeps equal rows equal across batches.
+            if pa.types.is_integer(column.type) or pa.types.is_boolean(column.type):
+                column = pc.cast(column, pa.float64())
+            hash_columns[fields[i].name] = column
+        frame = pa.table(hash_columns).to_pandas()
+        row_hashes.append(pd.util.hash_pandas_object(frame, index=False).to_numpy())
+
+    if rows == 0:
+        return None
+    all_hashes = np.concatenate(row_hashes)
+    dataset_summary = {
+        "row_count": rows,
+        "column_count": len(fields),
+        "duplicate_row_count": int(len(all_hashes) - len(np.unique(all_hashes))),
+    }
 
-        rows, columns = df.shape
-        duplicate_row_count = int(df.duplicated().sum())
-        dataset_summary = {
-            "row_count": rows,
-            "column_count": columns,
-            "duplicate_row_count": duplicate_row_count,
+    column_diagnostics = []
+    for i, field in enumerate(fields):
+        missing_count = int(null_counts[i])
+        unique_count = hll_estimate(sketches[i]) if sketches[i] is not None else len(distinct[i])
+        # The dtype the column would have after Table.to_pandas(): ints with nulls
+        # become float64, bools with nulls become object.
+        if pa.types.is_floating(field.type) or (pa.types.is_integer(field.type) and missing_count):
+            data_type = "float"
+        elif pa.types.is_integer(field.type) or (pa.types.is_boolean(field.type) and not missing_count):
+            data_type = "integer"
+        else:
+            data_type = "categorical"
+
+        col_diag = {
+            "column_name": field.name,
+            "data_type": data_type,
+            "missing_count": missing_count,
+            "missing_percentage": round(missing_count / rows * 100, 2),
+            "constant_flag": unique_count == 1
         }
+        if is_numeric[i] and unique_count > 2:
+            n, _, m2, m3, m4, max_abs = moments[i]
+            skewness, kurtosis = shape_from_moments(n, m2, m3, m4, max_abs)
+            col_diag["skewness"] = round(float(skewness), 2)
+            col_diag["kurtosis"] = round(float(kurtosis), 2)
+
+        non_null = rows - missing_count
+        if data_type == "categorical" and non_null > 0:
+            col_diag["unique_count"] = unique_count
+            col_diag["unique_ratio"] = round(unique_count / non_null, 4)
+
+        column_diagnostics.append(col_diag)
+
+    return {
+        "filename": os.path.basename(file_path),
+        "dataset_summary": dataset_summary,
+        "column_diagnostics": column_diagnostics,
+    }
 
-        column_diagnostics = []
-        for header in df.columns:
-            series = df[header]
+def _build_diagnostic_report(file_path: str):
+    """
+    Builds the diagnostic report for one file. Returns None when the dataset is empty.
+    """
+    file_name = os.path.basename(file_path)
+    if pa_csv is not None and not _is_parquet(file_path) and os.path.getsize(file_path) >= STREAMING_MIN_BYTES:
+        try:
+            return _stream_diagnostic_report(file_path)
+        except Exception as e:
+            print(f"Info: could not stream {file_path} ({e}); loading it whole.")
+    df = load_dataset_cached(
+        file_path,
+        on_bad_lines='skip',
+        na_values=DIAGNOSTIC_NA_VALUES,
+        encoding='utf-8',
+        low_memory=False
+    )
+
+    if df.empty:
+        return None
+    _compact_text_columns(df)
+
+    rows, columns = df.shape
+    duplicate_row_count = _count_duplicate_rows(df)
+    dataset_summary = {
+        "row_count": rows,
+        "column_count": columns,
+        "duplicate_row_count": duplicate_row_count,
+    }
 
-            # Infer data type robustly (float, integer, or categorical)
-            if pd.api.types.is_numeric_dtype(series):
-                data_type = "float" if pd.api.types.is_float_dtype(series) else "integer"
-            else:
-                data_type = "categorical"
-
-            missing_count = int(series.isnull().sum())
-            missing_percentage = round(series.isnull().mean() * 100, 2)
-            constant_flag = bool(series.nunique(dropna=True) == 1)
-
-            col_diag = {
-                "column_name": header,
-                "data_type": data_type,
-                "missing_count": missing_count,
-                "missing_percentage": missing_percentage,
-                "constant_flag": constant_flag
-            }
-
-            # Numeric columns: only add allowed numeric metrics if at least 3 unique values
-            if data_type in ["integer", "float"]:
-                clean_series = series.dropna()
-                if clean_series.nunique() > 2:
-                    col_diag["skewness"] = round(float(clean_series.skew()), 2)
-                    col_diag["kurtosis"] = round(float(clean_series.kurtosis()), 2)
-
-            # Categorical columns: only add allowed categorical metrics if non-empty
-            if data_type == "categorical":
-                clean_series = series.dropna()
-                if len(clean_series) > 0:
-                    unique_count = int(clean_series.nunique())
-                    unique_ratio = round(unique_count / len(clean_series), 4) if len(clean_series) > 0 else 0
-                    col_diag["unique_count"] = unique_count
-                    col_diag["unique_ratio"] = unique_ratio
-
-            column_diagnostics.append(col_diag)
-
-        diagnostic_report = {
-            "filename": file_name,
-            "dataset_summary": dataset_summary,
-            "column_diagnostics": column_diagnostics,
+    # Frame-level aggregates up front; the loop below only assembles the report.
+    null_counts = df.isnull().sum()
+    value_counts = rows - null_counts
+    cached_profiles = load_column_profiles(file_path, df.columns)
+    if len(cached_profiles) == columns:
+        unique_counts = pd.Series({h: p["unique_values"] for h, p in cached_profiles.items()}, dtype=np.int64)
+    else:
+        unique_counts = frame_nunique(df, _map_columns)
+        save_column_profiles(file_path, {
+            header: {"missing_count": int(null_counts[header]), "unique_values": int(unique_counts[header])}
+            for header in df.columns if header not in cached_profiles
+        })
+    numeric_columns = [header for header in df.columns if pd.api.types.is_numeric_dtype(df[header])]
+    # Skewness and kurtosis are only reported for numeric columns with at least 3 unique values.
+    shaped_columns = [header for header in numeric_columns if unique_counts[header] > 2]
+    numeric_set = set(numeric_columns)
+    if NUMBA_AVAILABLE:
+        # One fused moments pass per column instead of separate pandas skew / kurtosis scans.
+        shapes = {}
+        for header in shaped_columns:
+            values = df[header].to_numpy(dtype=np.float64, na_value=np.nan)
+            shapes[header] = skew_kurtosis(values[~np.isnan(values)])
+        skews = pd.Series({header: shape[0] for header, shape in shapes.items()}, dtype=np.float64)
+        kurtoses = pd.Series({header: shape[1] for header, shape in shapes.items()}, dtype=np.float64)
+    else:
+        skews = df[shaped_columns].skew()
+        kurtoses = df[shaped_columns].kurtosis()
+
+    column_diagnostics = []
+    for header in df.columns:
+        # Infer data type robustly (float, integer, or categorical)
+        if header in numeric_set:
+            data_type = "float" if pd.api.types.is_float_dtype(df[header]) else "integer"
+        else:
+            data_type = "categorical"
+
+        missing_count = int(null_counts[header])
+        col_diag = {
+            "column_name": header,
+            "data_type": data_type,
+            "missing_count": missing_count,
+            "missing_percentage": round(missing_count / rows * 100, 2),
+            "constant_flag": bool(unique_counts[header] == 1)
         }
 
+        if header in skews.index:
+            col_diag["skewness"] = round(float(skews[header]), 2)
+            col_diag["kurtosis"] = round(float(kurtoses[header]), 2)
+
+        # Categorical columns: only add allowed categorical metrics if non-empty
+        if data_type == "categorical" and value_counts[header] > 0:
+            unique_count = int(unique_counts[header])
+            col_diag["unique_count"] = unique_count
+            col_diag["unique_ratio"] = round(unique_count / int(value_counts[header]), 4)
+
+        column_diagnostics.append(col_diag)
+
+    return {
+        "filename": file_name,
+        "dataset_summary": dataset_summary,
+        "column_diagnostics": column_diagnostics,
+    }
+
+@celery_app.task(time_limit=1800, ignore_result=True)
+def generate_diagnostic_report(file_path: str, lock_token: str = None):
+    cache_key = f"diagnostics:{os.path.basename(file_path)}"
+    try:
+        diagnostic_report = _build_diagnostic_report(file_path)
+        if diagnostic_report is None:
+            redis_cache.delete(cache_key)
+            return {"status": "ERROR", "message": "Dataset is empty."}
+
         redis_cache.set(
             cache_key,
-            json.dumps(diagnostic_report, cls=NumpyJSONEncoder),
+            dumps_json(diagnostic_report),
             ex=86400
         )
         return diagnostic_report
@@ -204,6 +1014,8 @@ def generate_diagnostic_report(file_path: str):
     except Exception as e:
         print(f"CRITICAL ERROR in generate_diagnostic_report: {e}")
         raise e
+    finally:
+        release_dispatch_lock(cache_key, lock_token)
 
 @celery_app.task(time_limit=1800)
 def generate_treatment_plans_task(dataset_name: str, target_variable: str, goal: str):
@@ -217,7 +1029,7 @@ def generate_treatment_plans_task(dataset_name: str, target_variable: str, goal:
         if not report_str:
             return {"status": "FAILURE", "error": f"Diagnostic report for {dataset_name} not found in cache."}
             
-        diagnostic_report = json.loads(report_str)
+        diagnostic_report = orjson.loads(report_str)
         
         # Add context for the AI, which can be used in more advanced prompts later
         diagnostic_report['modeling_context'] = {
@@ -242,37 +1054,77 @@ def get_temporal_profile(df: pd.DataFrame, col: str) -> dict:
         return {"is_time_series": False}
     time_col = time_cols[0]
     try:
-        ts_data = pd.to_datetime(df[time_col], errors='coerce').dropna()
-        if ts_data.empty: return {"is_time_series": False}
+        times = pd.to_datetime(df[time_col], errors='coerce')
+        if times.isna().all(): return {"is_time_series": False}
     except Exception:
         return {"is_time_series": False}
-    ts_series = df.set_index(time_col)[col].sort_index().dropna()
+
+    # acf only needs the values in chronological order: no re-indexed copy, and the
+    # sort is skipped entirely when the file is already time-ordered (the common case).
+    keep = (times.notna() & df[col].notna()).to_numpy()
+    times = times.values[keep]
+    values = df[col].to_numpy()[keep]
+    if len(values) > 1 and not (np.diff(times) >= np.timedelta64(0)).all():
+        values = values[np.argsort(times, kind='stable')]
+
     acf_1 = None
-    if ts_series.nunique() > 1 and len(ts_series) > 1:
+    if len(values) > 1 and pd.unique(values).size > 1:
         try:
-            acf_1 = round(acf(ts_series, nlags=1, fft=False)[1], 2)
+            acf_1 = round(acf(values, nlags=1, fft=False)[1], 2)
         except Exception:
             acf_1 = None
     return {"is_time_series": True, "temporal_stability_acf1": acf_1}
 
-def get_mnar_indicators(df: pd.DataFrame, col: str) -> dict:
-    correlations = {}
-    missing_indicator = df[col].isnull().astype(int)
-    for other_col in df.columns:
-        if other_col == col: continue
-        try:
-            if pd.api.types.is_numeric_dtype(df[other_col]) and df[other_col].nunique() > 1:
-                corr = missing_indicator.corr(df[other_col])
-                if pd.notnull(corr) and abs(corr) > 0.3:
-                    correlations[other_col] = round(corr, 2)
-        except Exception:
-            continue
-    return correlations
-
-def get_statistical_profile(df: pd.DataFrame, column_name: str) -> dict:
-    detected_type = detect_data_type(df[column_name])
+def _pearson_with(frame: pd.DataFrame, target: np.ndarray) -> pd.Series:
+    """
+    Pearson correlation of every column in frame with target, each over the rows where
+    that column is present (pairwise deletion, as Series.corr does). One masked
+    two-pass computation for the whole block instead of DataFrame.corrwith, which
+    calls Series.corr column by column.
+    """
+    values = frame.to_numpy(dtype=np.float64, na_value=np.nan)
+    present = ~np.isnan(values)
+    counts = present.sum(axis=0)
+    target = target.astype(np.float64)[:, None]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        value_means = np.where(present, values, 0.0).sum(axis=0) / counts
+        target_means = np.where(present, target, 0.0).sum(axis=0) / counts
+        value_dev = np.where(present, values - value_means, 0.0)
+        target_dev = np.where(present, target - target_means, 0.0)
+        correlations = (value_dev * target_dev).sum(axis=0) / np.sqrt(
+            (value_dev ** 2).sum(axis=0) * (target_dev ** 2).sum(axis=0))
+    correlations[counts < 2] = np.nan
+    return pd.Series(correlations, index=frame.columns)
+
+def get_mnar_indicators(df: pd.DataFrame, col: str, is_missing: pd.Series = None) -> dict:
+    if is_missing is None:
+        is_missing = df[col].isnull()
+    # No missing values (or nothing but) means a constant indicator: nothing can correlate.
+    if is_missing.sum() in (0, len(is_missing)):
+        return {}
+    missing_indicator = is_missing.astype('int8')
+    # One vectorised Pearson pass over every other non-constant numeric column.
+    numeric = df.select_dtypes(include=[np.number, 'bool']).drop(columns=[col], errors='ignore')
+    numeric = numeric.loc[:, numeric.nunique() > 1]
+    if numeric.empty:
+        return {}
+    correlations = _pearson_with(numeric, missing_indicator.to_numpy())
+    significant = correlations[correlations.abs() > 0.3].round(2)
+    return significant.to_dict()
+
+def get_statistical_profile(df: pd.DataFrame, column_name: str, detected_type: str = None,
+                            cached: dict = None) -> dict:
+    """
+    cached, if given, is the column's entry from load_column_profiles; the counts and
+    mean/median it holds are taken as they are.
+    """
+    if detected_type is None:
+        detected_type = detect_data_type(df[column_name])
+    cached = cached or {}
 
-    missing_count = int(df[column_name].isnull().sum())
+    is_missing = df[column_name].isnull()
+    missing_count = cached["missing_count"] if "missing_count" in cached else int(is_missing.sum())
     total_count = len(df[column_name])
     missing_pct = (missing_count / total_count) * 100 if total_count > 0 else 0
 
@@ -281,14 +1133,22 @@ def get_statistical_profile(df: pd.DataFrame, column_name: str) -> dict:
         "missing_count": missing_count, 
         "missing_pct": round(missing_pct, 4),
         "data_type": detected_type,
-        "unique_values": df[column_name].nunique()
+        "unique_values": cached["unique_values"] if "unique_values" in cached else column_nunique(df[column_name])
     }
-    if detected_type in ['integer', 'float', 'identifier']:
-        clean_data = df[column_name].dropna()
-        if not clean_data.empty:
-            profile["mean"] = round(clean_data.mean(), 2)
-            profile["median"] = round(clean_data.median(), 2)
-    profile["mnar_indicators"] = get_mnar_indicators(df, column_name)
+    # Text identifiers (names, codes) have no mean; only numeric dtypes are profiled.
+    series = df[column_name]
+    if detected_type in ['integer', 'float', 'identifier'] and pd.api.types.is_numeric_dtype(series.dtype):
+        if "mean" in cached:
+            profile["mean"] = cached["mean"]
+            profile["median"] = cached["median"]
+        else:
+            # One NaN-free float64 array feeds both statistics; median partitions it in place.
+            values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            values = values[~np.isnan(values)]
+            if values.size:
+                profile["mean"] = round(float(values.mean()), 2)
+                profile["median"] = round(float(np.median(values, overwrite_input=True)), 2)
+    profile["mnar_indicators"] = get_mnar_indicators(df, column_name, is_missing)
     profile.update(get_temporal_profile(df, column_name))
     return profile
 
@@ -300,15 +1160,29 @@ def perform_standardization(df: pd.DataFrame, column_name: str, method: str, fil
         raise ValueError(f"Column '{column_name}' is not numeric.")
     if df[column_name].isnull().any():
         raise ValueError(f"Column '{column_name}' contains missing values. Impute first.")
-    scaler = StandardScaler() if method == 'standard' else MinMaxScaler()
-    df[new_col_name] = scaler.fit_transform(df[[column_name]].values.astype(np.float32))
-    df.to_csv(file_path, index=False)
-    q1 = float(df[column_name].quantile(0.25))
-    q3 = float(df[column_name].quantile(0.75))
+    # A float32 column is handed over as a view; anything else is converted exactly once.
+    values = df[column_name].to_numpy(dtype=np.float32, copy=False)
+    if NUMBA_AVAILABLE:
+        df[new_col_name] = standard_scale(values) if method == 'standard' else minmax_scale(values)
+    elif method == 'standard':
+        # Plain NumPy with StandardScaler's conventions: float64 accumulation,
+        # population std, and a constant column centred rather than divided by 0.
+        mean = values.mean(dtype=np.float64)
+        std = values.std(dtype=np.float64)
+        df[new_col_name] = ((values - mean) / (std if std > 0 else 1.0)).astype(np.float32)
+    else:
+        # MinMaxScaler's conventions: a constant column maps to 0.
+        lo, hi = values.min(), values.max()
+        span = hi - lo
+        df[new_col_name] = (values - lo) / (span if span > 0 else np.float32(1.0))
+    write_dataset(df, file_path)
+    # Q1, median and Q3 from one partial sort instead of three separate scans.
+    original = df[column_name].to_numpy(dtype=np.float64, copy=False)
+    q1, median, q3 = np.percentile(original, [25, 50, 75]) if len(original) else (np.nan, np.nan, np.nan)
     audit_report = {
         "new_column_added": new_col_name, "message": f"Successfully created new column: '{new_col_name}'.",
         "method": method, "timestamp_utc": datetime.now(timezone.utc).isoformat(), "row_count_affected": len(df),
-        "input_stats_robust": {"median": float(df[column_name].median()), "interquartile_range": q3 - q1}
+        "input_stats_robust": {"median": float(median), "interquartile_range": float(q3 - q1)}
     }
     return audit_report
 
@@ -316,16 +1190,79 @@ def perform_delete_column(df: pd.DataFrame, column_name: str, file_path: str):
     if column_name not in df.columns:
         raise ValueError(f"Column '{column_name}' not found.")
     df.drop(columns=[column_name], inplace=True)
-    df.to_csv(file_path, index=False)
+    write_dataset(df, file_path)
+    return {"message": f"Successfully deleted column '{column_name}' and updated the dataset."}
+
+def perform_delete_column_file(file_path: str, column_name: str) -> dict:
+    """
+    Deletes a column straight from the file. With pyarrow the remaining columns are
+    parsed and rewritten as an Arrow Table, without building a DataFrame.
+    """
+    header = list(_peek_dataset(file_path, 0).columns)
+    if column_name not in header:
+        raise ValueError(f"Column '{column_name}' not found.")
+    table = read_dataset_table(file_path, usecols=[c for c in header if c != column_name])
+    if table is None:
+        return perform_delete_column(read_dataset(file_path), column_name, file_path)
+    write_dataset(table, file_path)
     return {"message": f"Successfully deleted column '{column_name}' and updated the dataset."}
 
+_COLUMN_PEEK_ROWS = 1000
+
+def _diagnosis_columns(file_path: str, column_name: str) -> list:
+    """
+    The columns get_statistical_profile can touch: the target, the first time/date
+    column (temporal profile) and every numeric column (MNAR correlations), in file
+    order. Numeric columns are recognised on a short sample of rows.
+    """
+    sample = _peek_dataset(file_path, _COLUMN_PEEK_ROWS)
+    header = list(sample.columns)
+    time_cols = [c for c in header if 'time' in c.lower() or 'date' in c.lower()]
+    wanted = {column_name, *time_cols[:1], *sample.select_dtypes(include=[np.number, 'bool']).columns}
+    return [c for c in header if c in wanted]
+
 @celery_app.task
 def perform_dataset_cleaning_task(file_path: str, action_type: str):
+    cleaned = {}
+    result = _clean_dataset(file_path, action_type, cleaned)
+    _restat_cleaned(cleaned)
+    return result
+
+@celery_app.task
+def perform_dataset_cleaning_task_batch(jobs: list):
+    """
+    Runs several {"file_path", "action_type"} cleaning jobs in one task. Results come
+    back in job order; each rewritten file's statistics are rebuilt once, from its
+    final cleaned frame.
+    """
+    cleaned = {}
+    results = [_clean_dataset(job["file_path"], job["action_type"], cleaned) for job in jobs]
+    _restat_cleaned(cleaned)
+    return {"status": "SUCCESS", "results": results}
+
+def _restat_cleaned(cleaned: dict):
+    """
+    Rebuilds the cached statistics of each rewritten file from the cleaned frame still
+    in memory, {file_path: DataFrame}, instead of parsing the file again. The figures
+    are exact; only the parse is skipped.
+    """
+    for file_path, df in cleaned.items():
+        try:
+            _store_statistics(file_path, _frame_statistics(file_path, df))
+        except Exception as e:
+            print(f"CRITICAL ERROR rebuilding statistics for {file_path}: {e}")
+            generate_comprehensive_stats.delay(file_path)
+
+def _clean_dataset(file_path: str, action_type: str, cleaned: dict) -> dict:
+    """
+    Applies one dataset-level cleaning action and rewrites the file when it dropped
+    rows, recording the cleaned frame in cleaned[file_path] for _restat_cleaned.
+    """
     try:
         if not os.path.exists(file_path):
             return {"status": "FAILURE", "error": "File not found."}
 
-        df = pd.read_csv(file_path, on_bad_lines='skip')
+        df = load_dataset_cached(file_path, on_bad_lines='skip')
         original_rows = len(df)
 
         if action_type == 'drop_na_rows':
@@ -341,8 +1278,13 @@ def perform_dataset_cleaning_task(file_path: str, action_type: str):
         else:
             return {"status": "FAILURE", "error": f"Unknown cleaning action: {action_type}"}
 
-        # Overwrite the original file with the cleaned data
-        df.to_csv(file_path, index=False)
+        # Nothing dropped means nothing to rewrite: the file, its mtime and every cache
+        # keyed on it stay valid.
+        if rows_affected:
+            # Overwrite the original file with the cleaned data
+            write_dataset(df, file_path)
+            cleaned[file_path] = df
+            redis_cache.delete(f"diagnostics:{os.path.basename(file_path)}")
 
         return {"status": "SUCCESS", "message": message, "rows_affected": rows_affected}
 
@@ -358,22 +1300,24 @@ def perform_imputation(df: pd.DataFrame, column_name: str, method: str, value=No
     if original_missing_count == 0:
         return {"message": "No missing values to impute.", "rows_affected": 0}
 
+    # Frame-level fillna(inplace=True) fills the column's existing block; the chained
+    # df[col].fillna(inplace=True) form is a no-op under Copy-on-Write.
     if method == 'mean':
         fill_value = df[column_name].mean()
-        df[column_name].fillna(fill_value, inplace=True)
+        df.fillna({column_name: fill_value}, inplace=True)
     elif method == 'median':
         fill_value = df[column_name].median()
-        df[column_name].fillna(fill_value, inplace=True)
+        df.fillna({column_name: fill_value}, inplace=True)
     elif method == 'mode':
         fill_value = df[column_name].mode()[0]
-        df[column_name].fillna(fill_value, inplace=True)
+        df.fillna({column_name: fill_value}, inplace=True)
     elif method == 'constant':
         dtype = df[column_name].dtype
         try:
             fill_value = pd.Series([value]).astype(dtype).iloc[0]
         except (ValueError, TypeError):
             fill_value = value
-        df[column_name].fillna(fill_value, inplace=True)
+        df.fillna({column_name: fill_value}, inplace=True)
     else:
         raise ValueError(f"Invalid imputation method: {method}")
 
@@ -392,13 +1336,13 @@ def _apply_plan_steps(df: pd.DataFrame, steps: list) -> pd.DataFrame:
             for col in cols:
                 if col in df_copy.columns and pd.api.types.is_numeric_dtype(df_copy[col]):
                     median_val = df_copy[col].median()
-                    df_copy[col].fillna(median_val, inplace=True)
+                    df_copy.fillna({col: median_val}, inplace=True)
         elif func == 'impute_mode' and cols:
             for col in cols:
                 if col in df_copy.columns:
                     mode_val = df_copy[col].mode()
                     if not mode_val.empty:
-                        df_copy[col].fillna(mode_val[0], inplace=True)
+                        df_copy.fillna({col: mode_val[0]}, inplace=True)
     return df_copy
 
 def execute_ai_transformation(df: pd.DataFrame, code_str: str) -> pd.DataFrame:
@@ -572,7 +1516,7 @@ def detect_data_leakage(df: pd.DataFrame, target: str) -> list:
 def run_impact_simulation_task(dataset_name: str, plans: dict, target_variable: str, goal: str):
     try:
         file_path = os.path.join(os.path.dirname(__file__), '..', 'public', dataset_name)
-        df_raw = pd.read_csv(file_path, on_bad_lines='skip', low_memory=False)
+        df_raw = read_dataset(file_path, on_bad_lines='skip', low_memory=False)
 
         leakage_warnings = detect_data_leakage(df_raw, target_variable)
 
@@ -637,7 +1581,7 @@ def apply_ai_plan_task(dataset_name: str, python_code: str, note: str = "Applied
             return {"status": "FAILURE", "error": "File not found."}
 
         # 1. Load Data
-        df = pd.read_csv(file_path, on_bad_lines='skip', low_memory=False)
+        df = read_dataset(file_path, on_bad_lines='skip', low_memory=False)
         original_rows = len(df)
 
         # 2. Execute the AI Code (REUSING the safe executor we made)
@@ -647,12 +1591,14 @@ def apply_ai_plan_task(dataset_name: str, python_code: str, note: str = "Applied
         
         # 3. Save Over the Original File (Or you could version it)
         # For this stage, overwriting is expected behavior for "Cleaning"
-        df_clean.to_csv(file_path, index=False)
+        write_dataset(df_clean, file_path)
 
         # 4. Invalidate Cache (CRITICAL)
         # If we don't do this, the UI will still show the old "Dirty" stats
-        redis_cache.delete(f"statistics:{dataset_name}")
-        redis_cache.delete(f"diagnostics:{dataset_name}")
+        with redis_cache.pipeline(transaction=False) as pipe:
+            pipe.delete(f"statistics:{dataset_name}", f"summary:{dataset_name}", f"diagnostics:{dataset_name}")
+            pipe.srem(STATISTICS_INDEX_KEY, dataset_name)
+            pipe.execute()
 
         return {
             "status": "SUCCESS", 
@@ -668,21 +1614,99 @@ def apply_ai_plan_task(dataset_name: str, python_code: str, note: str = "Applied
 
 @celery_app.task
 def route_task(dataset_name: str, column_name: str, task_type: str, task_params: dict = None):
+    return _route_job(dataset_name, column_name, task_type, task_params, {})
+
+@celery_app.task(time_limit=1800)
+def route_task_batch(jobs: list):
+    """
+    Runs several route_task jobs ({"dataset_name", "column_name", "task_type",
+    "task_params"}) in one task, in order. Jobs on the same dataset share one parsed
+    DataFrame, which the imputation and scaling jobs update in place as they write.
+    Diagnosis jobs are profiled in order, but their LLM interpretations are sent
+    together afterwards, one multi-column request per dataset.
+    """
+    frames, interpretations = {}, {}
+    results = []
+    for index, job in enumerate(jobs):
+        deferred = []
+        results.append(_route_job(job["dataset_name"], job["column_name"], job["task_type"],
+                                  job.get("task_params"), frames, deferred))
+        if deferred:
+            interpretations[index] = deferred[0]
+    for index, result in _interpret_deferred(interpretations).items():
+        results[index] = result
+    return {"status": "SUCCESS", "results": results}
+
+def _interpret_deferred(pending: dict) -> dict:
+    """
+    {job index: (dataset_name, column_name, profile, bypass_cache)} -> {job index: result},
+    with one get_ai_interpretations call per dataset and bypass_cache setting. A column
+    profiled twice in one batch (e.g. before and after an imputation) goes into a later
+    call, so both of its interpretations are kept.
+    """
+    calls, open_calls = [], {}
+    for index, (dataset_name, column_name, profile, bypass_cache) in pending.items():
+        call = open_calls.get((dataset_name, bypass_cache))
+        if call is None or column_name in call[1]:
+            call = (bypass_cache, {})
+            open_calls[(dataset_name, bypass_cache)] = call
+            calls.append(call)
+        call[1][column_name] = (index, profile)
+
+    results = {}
+    for bypass_cache, columns in calls:
+        try:
+            interpreted = get_ai_interpretations({column: profile for column, (_, profile) in columns.items()},
+                                                 bypass_cache=bypass_cache)
+        except Exception as e:
+            for index, _ in columns.values():
+                results[index] = {"status": "FAILURE", "error": str(e)}
+            continue
+        for column, (index, _) in columns.items():
+            results[index] = {"status": "SUCCESS", "result": interpreted[column]}
+    return results
+
+def _route_job(dataset_name: str, column_name: str, task_type: str, task_params: dict, frames: dict,
+               deferred: list = None) -> dict:
+    """
+    Body of route_task. frames maps file paths to full DataFrames already loaded by
+    earlier jobs of the same batch. When `deferred` is given, a diagnosis job appends
+    (dataset_name, column_name, profile, bypass_cache) to it and returns None instead of
+    calling the LLM itself.
+    """
+    file_path = os.path.join(os.path.dirname(__file__), '..', 'public', dataset_name)
     try:
-        file_path = os.path.join(os.path.dirname(__file__), '..', 'public', dataset_name)
-        df = pd.read_csv(file_path)
-        if task_type == 'diagnosis':
-            profile = get_statistical_profile(df, column_name)
-            result = get_ai_interpretation(profile)
+        if task_type == 'delete_column':
+            frames.pop(file_path, None)
+            result = perform_delete_column_file(file_path, column_name)
             return {"status": "SUCCESS", "result": result}
-        elif task_type == 'delete_column':
-            result = perform_delete_column(df, column_name, file_path)
+
+        df = frames.get(file_path)
+        if df is None:
+            usecols = _diagnosis_columns(file_path, column_name) if task_type == 'diagnosis' else None
+            df = load_dataset_cached(file_path, usecols=usecols)
+            if usecols is None:
+                frames[file_path] = df
+        if task_type == 'diagnosis':
+            cached = load_column_profiles(file_path, [column_name]).get(column_name)
+            profile = get_statistical_profile(df, column_name, cached_detect_data_type(file_path, df, column_name), cached)
+            if cached is None:
+                save_column_profiles(file_path, {column_name: {
+                    key: profile[key] for key in ("missing_count", "unique_values", "mean", "median") if key in profile
+                }})
+            bypass_cache = bool(task_params.get('bypass_cache')) if task_params else False
+            if deferred is not None:
+                deferred.append((dataset_name, column_name, profile, bypass_cache))
+                return None
+            result = get_ai_interpretation(profile, bypass_cache=bypass_cache)
             return {"status": "SUCCESS", "result": result}
         elif task_type.startswith('impute_'):
             method = task_type.split('_')[1]
             custom_value = task_params.get('value') if task_params else None
             result = perform_imputation(df, column_name, method, value=custom_value)
-            df.to_csv(file_path, index=False)
+            # Nothing to fill means nothing to rewrite.
+            if result["rows_affected"]:
+                write_dataset(df, file_path)
             return {"status": "SUCCESS", "result": result}
         elif task_type in ['standard_scale', 'minmax_scale']:
             method = 'standard' if task_type == 'standard_scale' else 'minmax'
@@ -691,4 +1715,6 @@ def route_task(dataset_name: str, column_name: str, task_type: str, task_params:
         else:
             return {"status": "ERROR", "message": "Unknown task type."}
     except Exception as e:
+        # A failed job may have left the shared frame half-modified.
+        frames.pop(file_path, None)
         return {"status": "FAILURE", "error": str(e)}
\ No newline at end of file
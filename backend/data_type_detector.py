@@ -1,20 +1,72 @@
+import numpy as np
 import pandas as pd
 import re
+from numeric_kernels import column_nunique
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = pc = None
 
 DATE_REGEX = re.compile(r'^\d{1,4}[-/.\s]\d{1,2}[-/.\s]\d{1,4}$')
 
 def is_likely_date_column(series: pd.Series) -> bool:
 
-    if not pd.api.types.is_object_dtype(series.dtype):
+    # Text may arrive as object, Arrow-backed string or category columns.
+    dtype = series.dtype
+    if not (pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype)
+            or isinstance(dtype, pd.CategoricalDtype)):
         return False
     
     sample = series.dropna().head(20)
     if sample.empty:
         return False
 
-    match_count = sample.astype(str).str.match(DATE_REGEX).sum()
+    # Text is matched as it is, through Arrow's RE2 matcher (C++, no backtracking);
+    # only categories, or objects that are not all strings, are stringified first.
+    if isinstance(dtype, pd.CategoricalDtype):
+        sample = sample.astype(str)
+    if pc is None:
+        match_count = sample.astype(str).str.match(DATE_REGEX).sum()
+    else:
+        try:
+            strings = pa.array(sample, type=pa.string())
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            strings = pa.array(sample.astype(str), type=pa.string())
+        match_count = pc.sum(pc.match_substring_regex(strings, pattern=DATE_REGEX.pattern)).as_py() or 0
     return (match_count / len(sample)) > 0.75
 
+def _is_integral(values: np.ndarray) -> bool:
+    """
+    True when every value of a NaN-free float array is a whole number that fits in
+    int64, i.e. when an astype(int) round-trip would compare equal. One vectorised
+    modulo pass instead of a cast, a copy and an elementwise comparison.
+    """
+    # Non-finite or out-of-int64-range values could never be cast to int.
+    if not np.isfinite(values).all() or (values.size and np.abs(values).max() >= 2**63):
+        return False
+    return not np.mod(values, 1).any()
+
+def _numeric_dtype_type(sample: pd.Series):
+    """
+    Fast path for columns that already have an integer or float dtype: decides
+    integer / float / identifier on the raw ndarray, without pd.to_numeric and the
+    astype(int) round-trip. Returns None to defer to the general path.
+    """
+    if not pd.api.types.is_numeric_dtype(sample.dtype) or pd.api.types.is_bool_dtype(sample.dtype):
+        return None
+    values = sample.to_numpy()
+    if values.dtype.kind == 'f':
+        if not _is_integral(values):
+            return 'float'
+    elif values.dtype.kind not in 'iu':
+        return None
+
+    if sample.nunique() / len(sample) > 0.95:
+        return 'identifier'
+    return 'integer'
+
 def detect_data_type(series: pd.Series) -> str:
     series_cleaned = series.dropna()
 
@@ -22,11 +74,17 @@ def detect_data_type(series: pd.Series) -> str:
         return 'empty'
 
     sample = series_cleaned.head(1000)
+    numeric_type = _numeric_dtype_type(sample)
+    if numeric_type is not None:
+        return numeric_type
+
     numeric_sample = pd.to_numeric(sample, errors='coerce')
     if numeric_sample.notna().sum() / len(sample) > 0.90:
         try:
-            if (numeric_sample.dropna() == numeric_sample.dropna().astype(int)).all():
-                if numeric_sample.nunique() / len(numeric_sample.dropna()) > 0.95:
+            values = numeric_sample.to_numpy(dtype=np.float64, na_value=np.nan)
+            values = values[~np.isnan(values)]
+            if _is_integral(values):
+                if numeric_sample.nunique() / len(values) > 0.95:
                     return 'identifier'
                 return 'integer'
             else:
@@ -41,7 +99,7 @@ def detect_data_type(series: pd.Series) -> str:
         except (ValueError, TypeError, AttributeError):
             pass
 
-    unique_count = series_cleaned.nunique()
+    unique_count = column_nunique(series_cleaned)
     total_count = len(series_cleaned)
     unique_ratio = unique_count / total_count if total_count > 0 else 0
 
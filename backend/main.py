@@ -1,15 +1,21 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File
 from pydantic import BaseModel
 import shutil
+import io
 import os
-import glob
-import json
-from typing import Optional, Dict, Any
+from itertools import islice
+import orjson
+from typing import Optional, Dict, Any, List
 from fastapi.staticfiles import StaticFiles
-from celery_worker import celery_app as worker, generate_comprehensive_stats, generate_diagnostic_report, generate_treatment_plans_task,run_impact_simulation_task ,apply_ai_plan_task
+from starlette.formparsers import MultiPartParser
+from fastapi.responses import Response, FileResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from celery_worker import celery_app as worker, generate_comprehensive_stats, generate_comprehensive_stats_batch, generate_diagnostic_report, generate_treatment_plans_task,run_impact_simulation_task ,apply_ai_plan_task, STATISTICS_INDEX_KEY, acquire_dispatch_lock, acquire_dispatch_locks, iter_parquet_csv
+from celery import group
 from celery.result import AsyncResult
 from fastapi.middleware.cors import CORSMiddleware
 from redis import Redis
+from redis import asyncio as redis_async
 from dotenv import load_dotenv
 
 
@@ -18,6 +24,8 @@ REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 REDIS_DB_CACHE = int(os.getenv("REDIS_DB_CACHE", 1))
 redis_cache: Redis = Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB_CACHE, decode_responses=True)
+# Same db without decoding: cached JSON comes back as bytes for orjson or the response body.
+redis_cache_raw: Redis = Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB_CACHE)
 
 app = FastAPI()
 
@@ -43,6 +51,35 @@ class CleanRequest(BaseModel):
     action_type: str
 
 public_dir = os.path.join(os.path.dirname(__file__), '..', 'public')
+# public_dir with its trailing separator, for building many paths in a loop.
+PUBLIC_PREFIX = os.path.join(public_dir, '')
+REDIS_BATCH_SIZE = 1000
+STATS_DISPATCH_CHUNK = 16
+
+# The *.csv / *.parquet listing of public_dir, reused while the directory's mtime is unchanged
+# (creating, deleting or renaming a file in it bumps the mtime).
+_dataset_list_cache = {"mtime": None, "files": []}
+DATASET_EXTENSIONS = (".csv", ".parquet")
+
+def _list_dataset_files() -> list:
+    mtime = os.stat(public_dir).st_mtime_ns
+    if mtime != _dataset_list_cache["mtime"]:
+        # scandir's DirEntry answers name and is_file() from the readdir data, no stat per file.
+        with os.scandir(public_dir) as entries:
+            files = sorted(entry.name for entry in entries
+                           if entry.name.endswith(DATASET_EXTENSIONS) and not entry.name.startswith(".") and entry.is_file())
+        _dataset_list_cache.update(mtime=mtime, files=files)
+    return _dataset_list_cache["files"]
+
+def _invalidate_dataset_list():
+    # Coarse-grained mtimes may not move when two changes land within one tick.
+    _dataset_list_cache["mtime"] = None
+
+def _chunks(items: list, size: int = REDIS_BATCH_SIZE):
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
 class TaskRequest(BaseModel):
     dataset_name: str
     column_name: str
@@ -68,15 +105,31 @@ async def run_simulation(dataset_name: str, request: RunSimulationRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 def get_next_version_path(file_path: str) -> str:
-    if not os.path.exists(file_path):
+    # One directory listing, then the free "name (n).ext" is found in memory instead
+    # of probing the filesystem once per taken version.
+    directory, file_name = os.path.split(file_path)
+    with os.scandir(directory or ".") as entries:
+        taken = {entry.name for entry in entries}
+    if file_name not in taken:
         return file_path
-    base, ext = os.path.splitext(file_path)
+    base, ext = os.path.splitext(file_name)
     version = 1
-    while True:
-        new_path = f"{base} ({version}){ext}"
-        if not os.path.exists(new_path):
-            return new_path
+    while f"{base} ({version}){ext}" in taken:
         version += 1
+    return os.path.join(directory, f"{base} ({version}){ext}")
+
+def _dataset_path(dataset_name: str, not_found: str = "Dataset not found.") -> str:
+    """
+    The dataset's path under public_dir, or a 404. Asks once (EAFP) rather than
+    checking and then acting: the worker opens the file itself and reports a file
+    deleted in the meantime through the task result.
+    """
+    file_path = os.path.join(public_dir, dataset_name)
+    try:
+        os.stat(file_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise HTTPException(status_code=404, detail=not_found)
+    return file_path
 
 @app.post("/api/dataset/{dataset_name}/generate-plans")
 async def generate_plans(dataset_name: str, request: GeneratePlansRequest):
@@ -85,9 +138,7 @@ async def generate_plans(dataset_name: str, request: GeneratePlansRequest):
     """
     try:
         # Verify file exists before dispatching a potentially long-running task
-        file_path = os.path.join(public_dir, dataset_name)
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail="Dataset not found.")
+        _dataset_path(dataset_name)
 
         task = generate_treatment_plans_task.delay(
             dataset_name=dataset_name,
@@ -95,6 +146,8 @@ async def generate_plans(dataset_name: str, request: GeneratePlansRequest):
             goal=request.goal
         )
         return {"job_id": task.id, "status": "Treatment plan generation job started."}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -104,9 +157,7 @@ async def apply_plan(dataset_name: str, request: ApplyPlanRequest):
     Executes the Python code from a selected plan and permanently updates the dataset.
     """
     try:
-        file_path = os.path.join(public_dir, dataset_name)
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail="Dataset not found.")
+        _dataset_path(dataset_name)
 
         # Dispatch the task
         task = apply_ai_plan_task.delay(
@@ -115,20 +166,75 @@ async def apply_plan(dataset_name: str, request: ApplyPlanRequest):
             note=request.plan_name
         )
         return {"job_id": task.id, "status": "Plan application job started."}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+UPLOAD_COPY_BUFFER = 1 << 20
+UPLOAD_SENDFILE_CHUNK = 64 << 20
+# Starlette's multipart parser keeps each uploaded file in a SpooledTemporaryFile of
+# this size (spool_max_size; max_file_size before Starlette 0.40).
+UPLOAD_SPOOL_MAX_SIZE = getattr(MultiPartParser, "spool_max_size",
+                                getattr(MultiPartParser, "max_file_size", 1024 * 1024))
+
+def _upload_on_disk(upload: UploadFile) -> bool:
+    """
+    Whether Starlette has already rolled the upload over to a temporary file. A spooled
+    file rolls over once it grows past UPLOAD_SPOOL_MAX_SIZE, so this follows from the
+    public UploadFile.size. Calling fileno() on one still in memory would force it to
+    disk just to copy it.
+    """
+    return upload.size is not None and upload.size > UPLOAD_SPOOL_MAX_SIZE
+
+def _save_upload(upload: UploadFile, dst_path: str):
+    """
+    Copies an uploaded file to dst_path. Uploads that Starlette has already spilled to
+    a temporary file are copied kernel-side with os.sendfile, without passing through
+    Python buffers; small in-memory uploads go through a 1 MiB copy loop.
+    """
+    src = upload.file
+    with open(dst_path, "wb") as dst:
+        if hasattr(os, "sendfile") and _upload_on_disk(upload):
+            try:
+                src_fd = src.fileno()
+            except (AttributeError, OSError, io.UnsupportedOperation):
+                src_fd = None
+            if src_fd is not None:
+                offset = src.tell()
+                while sent := os.sendfile(dst.fileno(), src_fd, offset, UPLOAD_SENDFILE_CHUNK):
+                    offset += sent
+                return
+        _copy_buffered(src, dst)
+
+def _copy_buffered(src, dst):
+    # One reused 1 MiB buffer filled with readinto, instead of a fresh bytes object per
+    # read as copyfileobj allocates. SpooledTemporaryFile has readinto from Python 3.11.
+    readinto = getattr(src, "readinto", None)
+    if readinto is None:
+        shutil.copyfileobj(src, dst, UPLOAD_COPY_BUFFER)
+        return
+    buffer = memoryview(bytearray(UPLOAD_COPY_BUFFER))
+    while read := readinto(buffer):
+        dst.write(buffer[:read])
+
 @app.post("/api/upload")
 async def upload_dataset(file: UploadFile = File(...)):
     try:
         original_path = os.path.join(public_dir, file.filename)
         versioned_path = get_next_version_path(original_path)
-        with open(versioned_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # The copy blocks on disk I/O; run it off the event loop so concurrent uploads
+        # and polling requests are not serialised behind it.
+        await run_in_threadpool(_save_upload, file, versioned_path)
+        _invalidate_dataset_list()
         
-        # Dispatch both tasks concurrently for efficiency
-        generate_comprehensive_stats.delay(versioned_path)
-        generate_diagnostic_report.delay(versioned_path)
+        # Dispatch both tasks concurrently for efficiency; the locks stop the
+        # statistics/diagnostics polls that follow from enqueueing them again.
+        name = os.path.basename(versioned_path)
+        if token := acquire_dispatch_lock(f"statistics:{name}"):
+            generate_comprehensive_stats.delay(versioned_path, lock_token=token)
+        if token := acquire_dispatch_lock(f"diagnostics:{name}"):
+            generate_diagnostic_report.delay(versioned_path, lock_token=token)
 
         return {"status": "SUCCESS", "message": "File uploaded", "path": f"/{os.path.basename(versioned_path)}", "name": os.path.basename(versioned_path)}
     except Exception as e:
@@ -145,100 +251,133 @@ async def delete_dataset(dataset_name: str):
         # Expanded to also clear the new diagnostic cache
         cache_keys_to_delete = [
             f"statistics:{dataset_name}",
+            f"summary:{dataset_name}",
             f"diagnostics:{dataset_name}"
         ]
 
-        if os.path.exists(file_path):
+        try:
             os.remove(file_path)
-        else:
+            _invalidate_dataset_list()
+        except FileNotFoundError:
             print(f"Info: Attempted to delete '{dataset_name}', but file was already gone.")
 
         # Delete multiple keys from Redis if they exist
-        redis_cache.delete(*cache_keys_to_delete)
+        with redis_cache.pipeline(transaction=False) as pipe:
+            pipe.delete(*cache_keys_to_delete)
+            pipe.srem(STATISTICS_INDEX_KEY, dataset_name)
+            pipe.execute()
 
         return {"message": f"Successfully ensured dataset '{dataset_name}' is deleted."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"A server error occurred while deleting the dataset: {str(e)}")
 
+def _dataset_url(file_name: str) -> str:
+    if file_name.endswith(".parquet"):
+        return f"/api/dataset/{file_name}/csv"
+    return f"/{file_name}"
+
+@app.get("/api/dataset/{dataset_name}/csv")
+async def get_dataset_csv(dataset_name: str):
+    """
+    A Parquet dataset converted to CSV as it streams out; CSV datasets are sent as they are.
+    """
+    file_path = _dataset_path(dataset_name)
+    if not dataset_name.endswith(".parquet"):
+        return FileResponse(file_path, media_type="text/csv")
+    return StreamingResponse(iter_parquet_csv(file_path), media_type="text/csv")
+
 @app.get("/api/datasets")
 async def get_available_datasets():
     try:
-        csv_files = glob.glob(os.path.join(public_dir, "*.csv"))
-        datasets = []
-        for file_path in csv_files:
-            file_name = os.path.basename(file_path)
-            datasets.append({"name": file_name, "path": f"/{file_name}", "source": "server"})
-        return datasets
+        # The data table parses CSV text, so Parquet datasets are served through a CSV view.
+        return [{"name": file_name, "path": _dataset_url(file_name), "source": "server"} for file_name in _list_dataset_files()]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list datasets: {str(e)}")
 
 @app.get("/api/datasets/dashboard-summary")
 async def get_dashboard_summary():
     try:
-        disk_files = {os.path.basename(p) for p in glob.glob(os.path.join(public_dir, "*.csv"))}
-        cached_files = {k.split(':')[1] for k in redis_cache.keys("statistics:*")}
-        files_to_process = disk_files - cached_files
-        for filename in files_to_process:
-            generate_comprehensive_stats.delay(os.path.join(public_dir, filename))
-
-        files_to_remove = cached_files - disk_files
-        if files_to_remove:
-            keys_to_delete = [f"statistics:{fname}" for fname in files_to_remove]
-            redis_cache.delete(*keys_to_delete)
-
-        stat_keys = redis_cache.keys("statistics:*")
-        if not stat_keys: return []
-        
-        all_stats_raw = redis_cache.mget(stat_keys)
-        all_stats = [json.loads(s) for s in all_stats_raw if s]
-        
-        summaries = [{
-            "id": stats["filename"], "filename": stats["filename"], "size": stats["size"],
-            "rows": stats["rows"], "columns": stats["columns"], "status": stats["status"],
-            "qualityScore": stats["qualityScore"], "missing": stats["missing_pct"],
-            "duplicates": stats["duplicates_pct"], "inconsistencies": 0,
-            "lastModified": stats["lastModified"]
-        } for stats in all_stats]
-        return summaries
+        disk_files = set(_list_dataset_files())
+        # The index set names every cached file; no walk over the keyspace.
+        cached_files = redis_cache.smembers(STATISTICS_INDEX_KEY)
+        stale_files = sorted(cached_files - disk_files)
+        live_files = sorted(cached_files & disk_files)
+
+        summaries_raw = []
+        if stale_files or live_files:
+            # Stale deletes and the reads share one round-trip; chunked so no single command
+            # carries an unbounded argument list.
+            delete_batches = list(_chunks(stale_files))
+            with redis_cache_raw.pipeline(transaction=False) as pipe:
+                for batch in delete_batches:
+                    pipe.delete(*(f"{prefix}:{fname}" for fname in batch for prefix in ("statistics", "summary")))
+                    pipe.srem(STATISTICS_INDEX_KEY, *batch)
+                for batch in _chunks(live_files):
+                    pipe.mget([f"summary:{fname}" for fname in batch])
+                replies = pipe.execute()
+            summaries_raw = [raw for reply in replies[2 * len(delete_batches):] for raw in reply]
+
+        # Files never profiled, plus indexed ones whose entry has since expired.
+        files_to_process = (disk_files - cached_files) | {fname for fname, raw in zip(live_files, summaries_raw) if not raw}
+        lock_tokens = {}
+        if files_to_process:
+            # Files whose statistics job is already queued (their lock is held) are skipped.
+            acquired = acquire_dispatch_locks([f"statistics:{fname}" for fname in sorted(files_to_process)])
+            lock_tokens = {key.split(":", 1)[1]: token for key, token in acquired.items()}
+        if lock_tokens:
+            # Uncached files go out as one group of batch tasks, STATS_DISPATCH_CHUNK files
+            # each: one publish per chunk rather than per file, and large rediscoveries
+            # spread over several workers instead of queueing on one. Each task gets the
+            # lock tokens of its own files to release.
+            group(
+                generate_comprehensive_stats_batch.s(
+                    [f"{PUBLIC_PREFIX}{f}" for f in batch], {f: lock_tokens[f] for f in batch})
+                for batch in _chunks(list(lock_tokens), STATS_DISPATCH_CHUNK)
+            ).apply_async()
+
+        # The worker stores each row as finished JSON; the response is just those rows
+        # joined into an array, with nothing parsed or re-encoded here.
+        return Response(content=b"[" + b",".join(raw for raw in summaries_raw if raw) + b"]",
+                        media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve summaries: {str(e)}")
     
 @app.get("/api/dataset/{dataset_name}/diagnostics")
 async def get_dataset_diagnostics(dataset_name: str):
     cache_key = f"diagnostics:{dataset_name}"
-    cached_result = redis_cache.get(cache_key)
+    cached_result = redis_cache_raw.get(cache_key)
     if cached_result:
-        return json.loads(cached_result)
+        # Already serialized by the worker; sent as it is instead of parsed and re-encoded.
+        return Response(content=cached_result, media_type="application/json")
     else:
-        file_path = os.path.join(public_dir, dataset_name)
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail="Dataset not found.")
-        # The task is already triggered on upload, so we just signal it's in progress
-        generate_diagnostic_report.delay(file_path)
+        file_path = _dataset_path(dataset_name)
+        # The task is usually already running from the upload; only enqueue it if not.
+        if token := acquire_dispatch_lock(cache_key):
+            generate_diagnostic_report.delay(file_path, lock_token=token)
         raise HTTPException(status_code=202, detail="Diagnostic report generation is in progress.")
     
 @app.get("/api/dataset/{dataset_name}/statistics")
 async def get_dataset_statistics(dataset_name: str):
     cache_key = f"statistics:{dataset_name}"
-    cached_result = redis_cache.get(cache_key)
+    cached_result = redis_cache_raw.get(cache_key)
     if cached_result:
-        return json.loads(cached_result)
+        # Already serialized by the worker; sent as it is instead of parsed and re-encoded.
+        return Response(content=cached_result, media_type="application/json")
     else:
-        file_path = os.path.join(public_dir, dataset_name)
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail="Dataset not found.")
-        generate_comprehensive_stats.delay(file_path)
+        file_path = _dataset_path(dataset_name)
+        if token := acquire_dispatch_lock(cache_key):
+            generate_comprehensive_stats.delay(file_path, lock_token=token)
         raise HTTPException(status_code=202, detail="Statistics generation is in progress.")
     
 @app.post("/api/dataset/{dataset_name}/refresh-statistics")
 async def refresh_dataset_statistics(dataset_name: str):
-    file_path = os.path.join(public_dir, dataset_name)
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="Dataset not found.")
+    file_path = _dataset_path(dataset_name)
     
     # Refresh both statistics and diagnostics
-    redis_cache.delete(f"statistics:{dataset_name}")
-    redis_cache.delete(f"diagnostics:{dataset_name}")
+    with redis_cache.pipeline(transaction=False) as pipe:
+        pipe.delete(f"statistics:{dataset_name}", f"summary:{dataset_name}", f"diagnostics:{dataset_name}")
+        pipe.srem(STATISTICS_INDEX_KEY, dataset_name)
+        pipe.execute()
     generate_comprehensive_stats.delay(file_path)
     generate_diagnostic_report.delay(file_path)
     return {"message": "Statistics and diagnostics refresh initiated."}
@@ -253,9 +392,16 @@ async def submit_task(request: TaskRequest):
     )
     return {"job_id": task.id, "status": "Job accepted."}
 
-@app.get("/api/analyze/status/{job_id}")
-async def get_analysis_status(job_id: str):
-    task_result = AsyncResult(job_id, app=worker)
+@app.post("/api/submit_tasks")
+async def submit_tasks(requests: List[TaskRequest]):
+    # One worker task for the whole list; poll it through /api/analyze/status/{job_id}.
+    task = worker.send_task(
+        'celery_worker.route_task_batch',
+        args=[[request.model_dump() for request in requests]]
+    )
+    return {"job_id": task.id, "status": "Jobs accepted.", "job_count": len(requests)}
+
+def _job_status(task_result: AsyncResult) -> dict:
     if task_result.ready():
         if task_result.successful():
             return task_result.get()
@@ -264,34 +410,63 @@ async def get_analysis_status(job_id: str):
     else:
         return {"status": "PENDING"}
 
+@app.get("/api/analyze/status/{job_id}")
+async def get_analysis_status(job_id: str):
+    return _job_status(AsyncResult(job_id, app=worker))
+
+SSE_KEEPALIVE_SECONDS = 15
+
+@app.get("/api/analyze/stream/{job_id}")
+async def stream_analysis_status(job_id: str):
+    """
+    Server-Sent Events alternative to polling /api/analyze/status/{job_id}: one
+    connection that receives a single event with the same payload once the job is
+    done. The Redis result backend publishes every state it stores on the task's
+    meta key, so the stream waits on that channel instead of re-querying.
+    """
+    task_result = AsyncResult(job_id, app=worker)
+    channel = worker.backend.get_key_for_task(job_id)
+
+    async def events():
+        client = redis_async.from_url(worker.conf.result_backend)
+        try:
+            async with client.pubsub() as pubsub:
+                # Subscribe before the first check so a result stored in between is not missed.
+                await pubsub.subscribe(channel)
+                # AsyncResult talks to the backend with the blocking client, so its checks
+                # run on the thread pool rather than stalling the event loop.
+                while not await run_in_threadpool(task_result.ready):
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=SSE_KEEPALIVE_SECONDS)
+                    if message is None:
+                        yield ": keep-alive\n\n"
+                status = await run_in_threadpool(_job_status, task_result)
+                yield b"data: " + orjson.dumps(status, default=str) + b"\n\n"
+        finally:
+            await client.aclose()
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.post("/api/statistics/{dataset_name}")
 async def start_statistics_generation(dataset_name: str):
     try:
-        file_path = os.path.join(public_dir, dataset_name)
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail="Dataset not found.")
-        task = generate_comprehensive_stats.delay(file_path)
+        file_path = _dataset_path(dataset_name)
+        # Polled through /api/statistics/status/{job_id}, so this call keeps its result.
+        task = generate_comprehensive_stats.apply_async((file_path,), ignore_result=False)
         return {"job_id": task.id, "status": "Statistics generation job started."}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/statistics/status/{job_id}")
 async def get_statistics_status(job_id: str):
-    task_result = AsyncResult(job_id, app=worker)
-    if task_result.ready():
-        if task_result.successful():
-            return task_result.get()
-        else:
-            return {"status": "FAILURE", "error": str(task_result.info)}
-    else:
-        return {"status": "PENDING"}
+    return _job_status(AsyncResult(job_id, app=worker))
     
 @app.post("/api/dataset/clean")
 async def clean_dataset(request: CleanRequest):
     try:
-        file_path = os.path.join(public_dir, request.dataset_name)
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail="Dataset not found.")
+        file_path = _dataset_path(request.dataset_name)
 
         task = worker.send_task(
             'celery_worker.perform_dataset_cleaning_task',
@@ -299,6 +474,27 @@ async def clean_dataset(request: CleanRequest):
         )
         
         return {"job_id": task.id, "message": f"Dataset cleaning job '{request.action_type}' started."}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/dataset/clean-batch")
+async def clean_datasets(requests: List[CleanRequest]):
+    try:
+        jobs = []
+        for request in requests:
+            file_path = _dataset_path(request.dataset_name, f"Dataset not found: {request.dataset_name}")
+            jobs.append({"file_path": file_path, "action_type": request.action_type})
+
+        task = worker.send_task(
+            'celery_worker.perform_dataset_cleaning_task_batch',
+            args=[jobs]
+        )
+
+        return {"job_id": task.id, "message": f"{len(jobs)} dataset cleaning jobs started."}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,241 @@
+import math
+import numpy as np
+import pandas as pd
+
+# numba is optional: without it callers fall back to their previous (sklearn/pandas) path.
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# fastmath and the parallel reduction reorder the sums, so a constant column can come
+# out with a std of a few ulps instead of 0. Like StandardScaler's near-constant check,
+# a std this small relative to the mean counts as zero.
+_NEAR_CONSTANT_RTOL = 10 * np.finfo(np.float64).eps
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _standard_scale_kernel(x):
+        n = x.shape[0]
+        total = 0.0
+        for i in prange(n):
+            total += x[i]
+        mean = total / n
+
+        squares = 0.0
+        for i in prange(n):
+            d = x[i] - mean
+            squares += d * d
+        std = math.sqrt(squares / n)
+
+        # Same convention as StandardScaler: a constant column is centred, not divided
+        # by 0, which leaves all zeros.
+        if std <= _NEAR_CONSTANT_RTOL * abs(mean):
+            return np.zeros_like(x), mean, 0.0
+        out = np.empty_like(x)
+        for i in prange(n):
+            out[i] = (x[i] - mean) / std
+        return out, mean, std
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _minmax_scale_kernel(x):
+        n = x.shape[0]
+        lo = x.min()
+        hi = x.max()
+
+        # Same convention as MinMaxScaler: a constant column maps to 0.
+        span = hi - lo
+        scale = span if span > 0.0 else 1.0
+        out = np.empty_like(x)
+        for i in prange(n):
+            out[i] = (x[i] - lo) / scale
+        return out, lo, hi
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _central_moments_kernel(x):
+        n = x.shape[0]
+        total = 0.0
+        max_abs = 0.0
+        for i in prange(n):
+            total += x[i]
+            max_abs = max(max_abs, abs(x[i]))
+        mean = total / n
+
+        m2 = 0.0
+        m3 = 0.0
+        m4 = 0.0
+        for i in prange(n):
+            d = x[i] - mean
+            d2 = d * d
+            m2 += d2
+            m3 += d2 * d
+            m4 += d2 * d2
+        return m2, m3, m4, max_abs
+
+def standard_scale(values: np.ndarray) -> np.ndarray:
+    """
+    Z-score scaling of a 1-D float array in one fused pass (population std, like
+    StandardScaler). Requires numba and a column without missing values.
+    """
+    if values.shape[0] == 0:
+        return values.copy()
+    return _standard_scale_kernel(values)[0]
+
+def minmax_scale(values: np.ndarray) -> np.ndarray:
+    """
+    Rescales a 1-D float array to [0, 1], like MinMaxScaler. Requires numba and a
+    column without missing values.
+    """
+    if values.shape[0] == 0:
+        return values.copy()
+    return _minmax_scale_kernel(values)[0]
+
+def skew_kurtosis(values: np.ndarray) -> tuple:
+    """
+    (skewness, excess kurtosis) of a 1-D float64 array without missing values, with
+    the same bias correction and near-constant handling as Series.skew() and
+    Series.kurtosis(). Both come from one fused pass over the centred values.
+    """
+    n = values.shape[0]
+    if n < 3:
+        return np.nan, np.nan
+    m2, m3, m4, max_abs = _central_moments_kernel(values)
+    return shape_from_moments(n, m2, m3, m4, max_abs)
+
+def central_moments(values: np.ndarray) -> tuple:
+    """
+    (count, mean, m2, m3, m4, max_abs) of a 1-D float64 array, where mK is the sum of
+    (x - mean) ** K. Partial results combine with merge_central_moments.
+    """
+    n = values.shape[0]
+    if n == 0:
+        return 0, 0.0, 0.0, 0.0, 0.0, 0.0
+    mean = float(values.mean())
+    d = values - mean
+    d2 = d * d
+    return n, mean, float(d2.sum()), float((d2 * d).sum()), float((d2 * d2).sum()), float(np.abs(values).max())
+
+def merge_central_moments(a: tuple, b: tuple) -> tuple:
+    """
+    Combines two central_moments results as if computed over the concatenated data
+    (the pairwise update of Chan et al. / Pebay).
+    """
+    na, mean_a, m2a, m3a, m4a, max_a = a
+    nb, mean_b, m2b, m3b, m4b, max_b = b
+    if na == 0:
+        return b
+    if nb == 0:
+        return a
+    n = na + nb
+    delta = mean_b - mean_a
+    delta2 = delta * delta
+    mean = mean_a + delta * nb / n
+    m2 = m2a + m2b + delta2 * na * nb / n
+    m3 = (m3a + m3b + delta * delta2 * na * nb * (na - nb) / n ** 2
+          + 3 * delta * (na * m2b - nb * m2a) / n)
+    m4 = (m4a + m4b + delta2 * delta2 * na * nb * (na * na - na * nb + nb * nb) / n ** 3
+          + 6 * delta2 * (na * na * m2b + nb * nb * m2a) / n ** 2
+          + 4 * delta * (na * m3b - nb * m3a) / n)
+    return n, mean, m2, m3, m4, max(max_a, max_b)
+
+def shape_from_moments(n: int, m2: float, m3: float, m4: float, max_abs: float) -> tuple:
+    """
+    (skewness, excess kurtosis) from central moment sums, using pandas' bias
+    correction and its tolerance for treating near-constant data as constant.
+    """
+    if n < 3:
+        return np.nan, np.nan
+
+    # Sums below the rounding error of the data count as zero (constant column).
+    eps = np.finfo(np.float64).eps
+    if abs(m2) < (eps * max_abs) ** 2 * n: m2 = 0.0
+    if abs(m3) < (eps * max_abs) ** 3 * n: m3 = 0.0
+    if abs(m4) < (eps * max_abs) ** 4 * n: m4 = 0.0
+
+    skewness = 0.0 if m2 == 0 else (n * (n - 1) ** 0.5 / (n - 2)) * (m3 / m2 ** 1.5)
+    if n < 4:
+        return skewness, np.nan
+    denominator = (n - 2) * (n - 3) * m2 ** 2
+    if denominator == 0:
+        return skewness, 0.0
+    kurtosis = n * (n + 1) * (n - 1) * m4 / denominator - 3 * (n - 1) ** 2 / ((n - 2) * (n - 3))
+    return skewness, kurtosis
+
+# === APPROXIMATE CARDINALITY ===
+# Exact nunique on a multi-million-row Python-object column builds a hash table of
+# every distinct value. Past this many values a HyperLogLog sketch is used instead:
+# 2^14 one-byte registers, ~0.8% standard error, values hashed in C chunk by chunk.
+# Arrow-backed strings stay exact: Arrow's own hash kernel beats the sketch there.
+APPROX_UNIQUE_THRESHOLD = 1_000_000
+_HLL_PRECISION = 14
+_HLL_CHUNK = 1_000_000
+
+def _leading_zeros(x: np.ndarray) -> np.ndarray:
+    # Branchless binary search over the 64 bits; x == 0 gives 64.
+    count = np.zeros(x.shape, dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high_clear = x < np.uint64(1 << (64 - shift))
+        count += high_clear.astype(np.uint8) * shift
+        x = np.where(high_clear, x << np.uint64(shift), x)
+    return count + (x == 0)
+
+def hll_registers() -> np.ndarray:
+    """
+    Empty HyperLogLog registers for hll_update / hll_estimate.
+    """
+    return np.zeros(1 << _HLL_PRECISION, dtype=np.uint8)
+
+def hll_update(registers: np.ndarray, values: np.ndarray):
+    """
+    Adds the non-null values to the sketch in place. Re-adding a value is a no-op,
+    so registers fed batch by batch match one fed the whole column.
+    """
+    for start in range(0, len(values), _HLL_CHUNK):
+        chunk = values[start:start + _HLL_CHUNK]
+        hashes = pd.util.hash_array(chunk[~pd.isna(chunk)], categorize=False)
+        buckets = (hashes >> np.uint64(64 - _HLL_PRECISION)).astype(np.intp)
+        ranks = np.minimum(_leading_zeros(hashes << np.uint64(_HLL_PRECISION)) + 1, 64 - _HLL_PRECISION + 1)
+        np.maximum.at(registers, buckets, ranks.astype(np.uint8))
+
+def hll_estimate(registers: np.ndarray) -> int:
+    """
+    Distinct-count estimate from HyperLogLog registers.
+    """
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    empty = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and empty:
+        # Small-range correction (linear counting).
+        estimate = m * math.log(m / empty)
+    return int(round(estimate))
+
+def approx_nunique(series: pd.Series) -> int:
+    """
+    HyperLogLog estimate of series.nunique(dropna=True).
+    """
+    registers = hll_registers()
+    hll_update(registers, series.to_numpy())
+    return hll_estimate(registers)
+
+def column_nunique(series: pd.Series) -> int:
+    """
+    series.nunique(dropna=True), approximated for object columns of at least
+    APPROX_UNIQUE_THRESHOLD values.
+    """
+    if len(series) >= APPROX_UNIQUE_THRESHOLD and pd.api.types.is_object_dtype(series.dtype):
+        return approx_nunique(series)
+    return int(series.nunique(dropna=True))
+
+def frame_nunique(df: pd.DataFrame, map_columns=None) -> pd.Series:
+    """
+    df.nunique(dropna=True) with column_nunique's approximation for long object columns.
+    map_columns(func, columns) -> list, if given, runs the per-column counts (e.g. on a
+    thread pool).
+    """
+    if len(df) < APPROX_UNIQUE_THRESHOLD:
+        return df.nunique(dropna=True)
+    count = lambda header: column_nunique(df[header])
+    counts = map_columns(count, df.columns) if map_columns is not None else [count(h) for h in df.columns]
+    return pd.Series(counts, index=df.columns, dtype=np.int64)
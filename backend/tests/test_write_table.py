@@ -0,0 +1,55 @@
+import os
+import sys
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+celery_worker = pytest.importorskip("celery_worker")
+
+
+def _frame():
+    return pd.DataFrame({
+        "price": [5.0, 1.5, None],
+        "whole": [1.0, 2.0, 3.0],
+        "count": [1, 2, 3],
+        "flag": [True, False, True],
+        "day": pd.to_datetime(["2024-01-01", "2024-01-02", None]),
+        "stamp": pd.to_datetime(["2024-01-01 10:30:00", "2024-01-02 00:00:00", "2024-01-03 23:59:59"]),
+    })
+
+
+def test_csv_rewrite_round_trips_dtypes(tmp_path):
+    df = _frame()
+    path = tmp_path / "data.csv"
+    celery_worker._write_table(df, str(path))
+
+    reread = pd.read_csv(path, parse_dates=["day", "stamp"])
+    assert reread.dtypes.to_dict() == df.dtypes.to_dict()
+    pd.testing.assert_frame_equal(reread, df, check_dtype=False)
+
+    parsed = celery_worker.read_dataset(str(path))
+    assert parsed["price"].dtype == "float64"
+    assert parsed["whole"].dtype == "float64"
+    assert parsed["count"].dtype == "int64"
+    assert parsed["flag"].dtype == "bool"
+    assert pd.api.types.is_datetime64_any_dtype(parsed["day"])
+    assert pd.api.types.is_datetime64_any_dtype(parsed["stamp"])
+    assert parsed["stamp"].tolist() == df["stamp"].tolist()
+
+
+def test_csv_rewrite_formatting(tmp_path):
+    # Pins what the Arrow writer puts on disk where it differs from DataFrame.to_csv.
+    path = tmp_path / "data.csv"
+    celery_worker._write_table(_frame(), str(path))
+    header, first = path.read_text().splitlines()[:2]
+
+    assert header.replace('"', '') == "price,whole,count,flag,day,stamp"
+    price, whole, count, flag, day, stamp = first.split(",")
+    assert price == "5"
+    assert whole == '"1.0"'
+    assert count == "1"
+    assert flag == "true"
+    assert day.startswith("2024-01-01")
+    assert stamp.startswith("2024-01-01 10:30:00")
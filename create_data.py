@@ -1,30 +1,48 @@
+import sys
 import pandas as pd
 import numpy as np
-import random
 
 # 1. Create a base dataset
+# Every column is built as one NumPy array (no per-row Python objects), so bumping
+# rows to millions stays fast and compact.
 rows = 1000
-df = pd.DataFrame()
+rng = np.random.default_rng()
 
 # TARGET: The thing we want to predict (0 or 1)
-df['churned'] = np.random.choice([0, 1], size=rows)
+churned = rng.integers(0, 2, size=rows)
 
 # LEAKAGE TYPE 1: The "Perfect Predictor" (100% Correlation)
 # e.g., A column that records the termination date (only exists if they churned)
-df['termination_status'] = df['churned'].apply(lambda x: 'Terminated' if x == 1 else 'Active')
+# The target itself is the category code: 0 -> 'Active', 1 -> 'Terminated'.
+termination_status = pd.Categorical.from_codes(churned, categories=['Active', 'Terminated'])
 
 # LEAKAGE TYPE 2: The "Subtle Leaker" (98% Correlation)
 # e.g., A billing flag that almost always matches the target
-df['billing_issue_flag'] = df['churned'] * 0.98 + np.random.normal(0, 0.01, rows)
+billing_issue_flag = churned * 0.98 + rng.normal(0, 0.01, rows)
 
 # LEAKAGE TYPE 3: High Cardinality ID (The "Overfitting" Trap)
 # Unique IDs that the model might memorize
-df['customer_transaction_id'] = [f"TXN_{i}_{random.randint(1000,9999)}" for i in range(rows)]
+customer_transaction_id = np.char.add(
+    np.char.add('TXN_', np.arange(rows).astype(str)),
+    np.char.add('_', rng.integers(1000, 10000, rows).astype(str)),
+)
 
-# Add some noise (normal columns)
-df['age'] = np.random.randint(18, 80, rows)
-df['balance'] = np.random.uniform(1000, 50000, rows)
+df = pd.DataFrame({
+    'churned': churned,
+    'termination_status': termination_status,
+    'billing_issue_flag': billing_issue_flag,
+    'customer_transaction_id': customer_transaction_id,
+    # Add some noise (normal columns)
+    'age': rng.integers(18, 80, rows),
+    'balance': rng.uniform(1000, 50000, rows),
+})
 
 # Save
-df.to_csv('leakage_stress_test.csv', index=False)
-print("Created 'leakage_stress_test.csv'. Upload this to DataCraft!")
\ No newline at end of file
+# --parquet writes a typed, zstd-compressed Parquet file instead, which the backend
+# workers read without any text parsing. The upload page only takes CSV.
+if '--parquet' in sys.argv[1:]:
+    df.to_parquet('leakage_stress_test.parquet', engine='pyarrow', compression='zstd', index=False)
+    print("Created 'leakage_stress_test.parquet'. Copy it into public/ for the backend tasks.")
+else:
+    df.to_csv('leakage_stress_test.csv', index=False)
+    print("Created 'leakage_stress_test.csv'. Upload this to DataCraft!")